@@ -0,0 +1,100 @@
+import hashlib
+from datetime import timezone
+
+from flask import current_app, jsonify, request
+
+from versions import table_versions
+
+
+TICKET_FIELDS = (
+    "ticket_id",
+    "severity",
+    "provider",
+    "resource",
+    "description",
+    "status",
+    "resolver_id",
+    "resolver",
+    "detected_at",
+    "sla_deadline",
+    "resolved_at",
+    "crowdstrike_id",
+)
+
+RANKING_FIELDS = (
+    "resolver_id",
+    "resolver",
+    "email",
+    "total_assigned",
+    "resolved_count",
+    "resolved_within_sla",
+    "resolved_outside_sla",
+    "in_progress_count",
+    "overdue_count",
+    "avg_resolution_time",
+    "sla_compliance_rate",
+    "severity_breakdown",
+)
+
+
+def parse_fields(value, allowed):
+    if not value:
+        return list(allowed)
+    wanted = [name.strip() for name in value.split(",")]
+    return [name for name in allowed if name in wanted] or list(allowed)
+
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+
+def ticket_to_dict(ticket, fields):
+    values = {}
+    for name in fields:
+        if name == "resolver":
+            values[name] = ticket.resolver.name if ticket.resolver else None
+        elif name in ("detected_at", "sla_deadline", "resolved_at"):
+            values[name] = _isoformat(getattr(ticket, name))
+        else:
+            values[name] = getattr(ticket, name)
+    return values
+
+
+def ranking_entry_to_dict(entry, fields):
+    resolver = entry["resolver"]
+    values = dict(entry, resolver_id=resolver.id, resolver=resolver.name, email=resolver.email)
+    values["avg_resolution_time"] = round(values["avg_resolution_time"], 2)
+    return {name: values[name] for name in fields}
+
+
+def _etag(versions):
+    digest = hashlib.sha1(f"{request.full_path}|{versions}".encode("utf-8")).hexdigest()
+    return digest[:20]
+
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains(etag)
+    if request.if_modified_since and last_modified:
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+
+def conditional_json(tables, build):
+    # The change counters are one primary-key read; the payload is only built
+    # when the client's copy is stale.
+    versions, last_modified = table_versions(*tables)
+    etag = _etag(versions)
+    if last_modified:
+        last_modified = last_modified.replace(tzinfo=timezone.utc)
+
+    if _not_modified(etag, last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = jsonify(build())
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
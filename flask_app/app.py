@@ -1,6 +1,9 @@
 import os
 from datetime import datetime, timedelta
+from itertools import chain
 
+import click
+from markupsafe import Markup
 from flask import (
     Flask,
     render_template,
@@ -8,6 +11,8 @@ from flask import (
     request,
     url_for,
     flash,
+    Response,
+    stream_with_context,
 )
 from flask_login import (
     LoginManager,
@@ -17,25 +22,157 @@ from flask_login import (
     current_user,
 )
 
-from models import db, User, Resolver, Misconfiguration
+from database import database_uri, engine_options
+from models import db, User, Resolver, Misconfiguration, ArchivedMisconfiguration, UnassignedStats, SyncState, Job
 from utils import (
     seed_default_admin,
     seed_mock_data_if_empty,
     calculate_sla_deadline,
-    ensure_overdue_status,
-    fetch_and_import_crowdstrike,
-    import_crowdstrike_detections,
+    detection_to_row,
 )
+from crowdstrike import crowdstrike_credentials
+from ingest_queue import RETRY_AFTER_SECONDS, enqueue_detections, idempotency_key
+from jobs import (
+    submit_job,
+    active_job,
+    recent_jobs,
+    job_to_dict,
+    fail_interrupted_jobs,
+    start_job_heartbeat,
+    start_scheduler,
+)
+from sla import ensure_overdue_status
+from reports import dashboard_metrics, recent_open_tickets, ticket_counts
+from queries import (
+    PAGE_SIZES,
+    TABLE_COLUMNS,
+    list_load_options,
+    ticket_filters_from_args,
+    filtered_tickets_query,
+    paginate_tickets,
+    parse_page_size,
+)
+from search import ensure_search_index
+from bulk import bulk_update_tickets, unassign_resolver_tickets
+from export import EXPORT_FORMATS, export_rows, iter_export
+from archive import ARCHIVE_AFTER_DAYS, archive_resolved_tickets
+from api import (
+    RANKING_FIELDS,
+    TICKET_FIELDS,
+    conditional_json,
+    parse_fields,
+    ranking_entry_to_dict,
+    ticket_to_dict,
+)
+from cache import cached, init_cache, load_cached_user
+from datagen import generate_dataset
+from instrumentation import init_instrumentation, render_metrics
+from migrations import run_migrations
+from rollups import (
+    daily_series,
+    ensure_daily_rollups,
+    pending_rollup_days,
+    roll_up_days,
+    sla_compliance_summary,
+    sparkline,
+    trend_for,
+)
+from ranking import ranking_entries, ranking_totals, rebuild_resolver_stats
+
+
+def init_db(app):
+    with app.app_context():
+        os.makedirs(os.path.join(app.instance_path, "data"), exist_ok=True)
+        db.create_all()
+        run_migrations()
+        ensure_search_index()
+        seed_default_admin()
+        seed_mock_data_if_empty()
+        if not UnassignedStats.query.first():
+            rebuild_resolver_stats()
+            db.session.commit()
+        fail_interrupted_jobs()
+
+
+def refresh_daily_rollups():
+    # The usual case after midnight is a single missing day, cheap enough to
+    # roll up inline. A longer backlog goes to the daily_rollup job and the
+    # page renders with the days already available.
+    days = pending_rollup_days()
+    if len(days) == 1:
+        roll_up_days(days)
+    elif days and not active_job("daily_rollup"):
+        submit_job("daily_rollup")
 
 
 def create_app():
     app = Flask(__name__)
     app.config["SECRET_KEY"] = os.getenv("SECRET_KEY", "dev-secret-key")
-    db_path = os.path.join(app.instance_path, "data", "app.db")
-    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{db_path}"
+    app.config["SQLALCHEMY_DATABASE_URI"] = database_uri(app.instance_path)
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(app.config["SQLALCHEMY_DATABASE_URI"])
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
+    app.config["AUTO_INIT_DB"] = os.getenv("AUTO_INIT_DB", "1") != "0"
+    init_cache(app.instance_path)
 
     db.init_app(app)
+    init_instrumentation(app)
+    if app.config["AUTO_INIT_DB"]:
+        init_db(app)
+
+    start_job_heartbeat(app)
+    start_scheduler(
+        app,
+        "crowdstrike_sync",
+        int(os.getenv("CROWDSTRIKE_SYNC_INTERVAL", "0")),
+        filter_query=os.getenv("CROWDSTRIKE_SYNC_FILTER") or None,
+    )
+    start_scheduler(app, "daily_rollup", int(os.getenv("ROLLUP_INTERVAL", "0")))
+    start_scheduler(app, "archive_tickets", int(os.getenv("ARCHIVE_INTERVAL", "0")))
+
+    @app.cli.command("init-db")
+    def init_db_command():
+        init_db(app)
+        click.echo("Banco de dados inicializado.")
+
+    @app.cli.command("migrate")
+    def migrate_command():
+        with app.app_context():
+            db.create_all()
+            ran = run_migrations()
+        for version, description in ran:
+            click.echo(f"Migração {version} aplicada: {description}")
+        if not ran:
+            click.echo("Nenhuma migração pendente.")
+
+    @app.cli.command("generate-data")
+    @click.option("--tickets", default=10000, show_default=True, help="Quantidade de tickets.")
+    @click.option("--resolvers", default=50, show_default=True, help="Quantidade de resolvedores.")
+    @click.option("--seed", default=42, show_default=True, help="Semente para dados reproduzíveis.")
+    @click.option("--days", default=180, show_default=True, help="Janela de detecção, em dias.")
+    def generate_data_command(tickets, resolvers, seed, days):
+        with app.app_context():
+            with click.progressbar(length=tickets, label="Gerando tickets") as bar:
+                result = generate_dataset(
+                    tickets,
+                    resolvers,
+                    seed=seed,
+                    days=days,
+                    progress=lambda done: bar.update(done - bar.pos),
+                )
+        click.echo(f"{result['tickets']} tickets inseridos para {result['resolvers']} resolvedores.")
+
+    @app.cli.command("rollup")
+    def rollup_command():
+        with app.app_context():
+            rolled = ensure_daily_rollups()
+        click.echo(f"{rolled} dias consolidados.")
+
+    @app.cli.command("archive-tickets")
+    @click.option("--days", type=int, default=None, help=f"Idade mínima após resolução (padrão {ARCHIVE_AFTER_DAYS}).")
+    def archive_tickets_command(days):
+        with app.app_context():
+            archived = archive_resolved_tickets(days)
+        click.echo(f"{archived} tickets arquivados.")
 
     login_manager = LoginManager()
     login_manager.login_view = "login"
@@ -43,14 +180,7 @@ def create_app():
 
     @login_manager.user_loader
     def load_user(user_id):
-        return User.query.get(int(user_id))
-
-    @app.before_request
-    def init_db():
-        os.makedirs(os.path.join(app.instance_path, "data"), exist_ok=True)
-        db.create_all()
-        seed_default_admin()
-        seed_mock_data_if_empty()
+        return load_cached_user(int(user_id))
 
     @app.route("/login", methods=["GET", "POST"])
     def login():
@@ -84,27 +214,33 @@ def create_app():
     @login_required
     def dashboard():
         ensure_overdue_status()
-        data = Misconfiguration.query.order_by(Misconfiguration.detected_at.desc()).all()
-        resolvers = Resolver.query.order_by(Resolver.name.asc()).all()
-
-        critical_count = len([i for i in data if i.severity == "CRITICAL" and i.status != "Resolved"])
-        high_count = len([i for i in data if i.severity == "HIGH" and i.status != "Resolved"])
-        overdue_count = len([i for i in data if i.status == "Overdue"])
-        resolved_count = len([i for i in data if i.status == "Resolved"])
-
-        metrics = [
-            {"label": "Críticos", "count": critical_count, "trend": "+12%", "severity": "CRITICAL"},
-            {"label": "Alta Severidade", "count": high_count, "trend": "-5%", "severity": "HIGH"},
-            {"label": "SLA Vencidos", "count": overdue_count, "trend": "+2", "severity": "INFORMAL"},
-            {"label": "Resolvidos (30d)", "count": resolved_count, "trend": "+18%", "severity": "LOW"},
-        ]
+        counts = cached("dashboard_metrics", ("misconfigurations", "archived_misconfigurations"), dashboard_metrics)
+        refresh_daily_rollups()
+        series = cached("daily_series", ("daily_rollups",), daily_series)
+
+        metrics = []
+        for label, key, severity, percent in [
+            ("Críticos", "critical", "CRITICAL", True),
+            ("Alta Severidade", "high", "HIGH", True),
+            ("SLA Vencidos", "overdue", "INFORMAL", False),
+            ("Resolvidos", "resolved", "LOW", True),
+        ]:
+            metrics.append(
+                {
+                    "label": label,
+                    "count": counts[key],
+                    "trends": trend_for(series, key, counts[key], percent=percent),
+                    "sparkline": sparkline(series, key, counts[key]),
+                    "severity": severity,
+                }
+            )
 
-        recent = [i for i in data if i.status != "Resolved"][:5]
+        recent = recent_open_tickets(limit=5)
         return render_template(
             "dashboard.html",
             metrics=metrics,
+            sla=sla_compliance_summary(series),
             recent=recent,
-            resolvers=resolvers,
             now=datetime.utcnow(),
         )
 
@@ -113,58 +249,72 @@ def create_app():
     def misconfigurations():
         ensure_overdue_status()
 
-        search = request.args.get("search", "").strip().lower()
-        severities = request.args.getlist("severity")
-        providers = request.args.getlist("provider")
-        statuses = request.args.getlist("status")
-        resolver_query = request.args.get("resolver", "").strip().lower()
-
-        query = Misconfiguration.query
-        if severities:
-            query = query.filter(Misconfiguration.severity.in_(severities))
-        if providers:
-            query = query.filter(Misconfiguration.provider.in_(providers))
-        if statuses:
-            query = query.filter(Misconfiguration.status.in_(statuses))
-
-        data = query.order_by(Misconfiguration.detected_at.desc()).all()
-
-        def matches_search(item):
-            if not search:
-                return True
-            return (
-                search in item.resource.lower()
-                or search in item.description.lower()
-                or search in item.crowdstrike_id.lower()
-                or search in item.ticket_id.lower()
-            )
-
-        def matches_resolver(item):
-            if not resolver_query:
-                return True
-            if resolver_query == "unassigned":
-                return item.resolver is None
-            if not item.resolver:
-                return False
-            return resolver_query in item.resolver.name.lower() or resolver_query in item.resolver.email.lower()
-
-        filtered = [i for i in data if matches_search(i) and matches_resolver(i)]
+        filters = ticket_filters_from_args(request.args)
+        query = filtered_tickets_query(filters).options(
+            *list_load_options(TABLE_COLUMNS, resolver=filters["resolver"] in ("", "unassigned"))
+        )
+        page = paginate_tickets(
+            query,
+            parse_page_size(request.args.get("page_size")),
+            after=request.args.get("after"),
+            before=request.args.get("before"),
+        )
         resolvers = Resolver.query.order_by(Resolver.name.asc()).all()
+        page_args = request.args.to_dict(flat=False)
+        page_args.pop("after", None)
+        page_args.pop("before", None)
 
         return render_template(
             "misconfigurations.html",
-            data=filtered,
+            data=page["items"],
+            page=page,
+            page_args=page_args,
+            page_sizes=PAGE_SIZES,
             resolvers=resolvers,
-            filters={
-                "search": search,
-                "severity": severities,
-                "provider": providers,
-                "status": statuses,
-                "resolver": resolver_query,
-            },
+            filters=filters,
             now=datetime.utcnow(),
         )
 
+    @app.route("/misconfigurations/export")
+    @login_required
+    def export_misconfigurations():
+        ensure_overdue_status()
+        export_format = request.args.get("format", "csv")
+        if export_format not in EXPORT_FORMATS:
+            return {"error": "formato inválido"}, 400
+
+        filters = ticket_filters_from_args(request.args)
+        rows = export_rows(filtered_tickets_query(filters), filters)
+        if request.args.get("include_archived") == "1":
+            archived = filtered_tickets_query(filters, ArchivedMisconfiguration)
+            rows = chain(rows, export_rows(archived, filters, ArchivedMisconfiguration))
+        filename = f"misconfigurations-{datetime.utcnow():%Y%m%d-%H%M%S}.{export_format}"
+        return Response(
+            stream_with_context(iter_export(rows, export_format)),
+            mimetype=EXPORT_FORMATS[export_format],
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+        )
+
+    @app.route("/misconfigurations/bulk", methods=["POST"])
+    @login_required
+    def bulk_misconfigurations():
+        try:
+            affected = bulk_update_tickets(
+                request.form.get("action"),
+                request.form.getlist("ticket_ids"),
+                resolver_id=request.form.get("resolver_id") or None,
+                status=request.form.get("status"),
+            )
+        except ValueError as exc:
+            flash(f"Erro na operação em lote: {exc}", "error")
+        else:
+            flash(f"{affected} ticket(s) atualizado(s).", "success")
+
+        next_url = request.form.get("next", "")
+        if not next_url.startswith("/") or next_url.startswith("//"):
+            next_url = url_for("misconfigurations")
+        return redirect(next_url)
+
     @app.route("/tickets/new", methods=["GET", "POST"])
     @login_required
     def new_ticket():
@@ -189,7 +339,7 @@ def create_app():
                     resolver_id=int(resolver_id) if resolver_id else None,
                     status=status,
                     detected_at=detected_at,
-                    crowdstrike_id=f"CS-{datetime.utcnow().year}-{int(datetime.utcnow().timestamp())}",
+                    crowdstrike_id=f"CS-{detected_at.year}-{int(detected_at.timestamp())}-{os.urandom(2).hex()}",
                     sla_deadline=calculate_sla_deadline(severity, detected_at),
                 )
                 db.session.add(ticket)
@@ -203,7 +353,11 @@ def create_app():
     @app.route("/ticket/<ticket_id>", methods=["GET", "POST"])
     @login_required
     def ticket_detail(ticket_id):
-        ticket = Misconfiguration.query.filter_by(ticket_id=ticket_id).first_or_404()
+        ticket = Misconfiguration.query.filter_by(ticket_id=ticket_id).first()
+        if ticket is None:
+            # Archived tickets stay reachable by link, read-only.
+            archived = ArchivedMisconfiguration.query.filter_by(ticket_id=ticket_id).first_or_404()
+            return render_template("ticket_detail.html", ticket=archived, resolvers=[], archived=True)
         resolvers = Resolver.query.order_by(Resolver.name.asc()).all()
 
         if request.method == "POST":
@@ -227,91 +381,27 @@ def create_app():
     @login_required
     def ranking():
         ensure_overdue_status()
-        data = Misconfiguration.query.order_by(Misconfiguration.detected_at.desc()).all()
-        resolvers = Resolver.query.order_by(Resolver.name.asc()).all()
-
-        stats = {}
-        now = datetime.utcnow()
-
-        for resolver in resolvers:
-            stats[resolver.email] = {
-                "resolver": resolver,
-                "resolved_count": 0,
-                "resolved_within_sla": 0,
-                "resolved_outside_sla": 0,
-                "in_progress_count": 0,
-                "overdue_count": 0,
-                "total_assigned": 0,
-                "avg_resolution_time": 0,
-                "sla_compliance_rate": 0,
-                "severity_breakdown": {
-                    "CRITICAL": 0,
-                    "HIGH": 0,
-                    "MEDIUM": 0,
-                    "LOW": 0,
-                    "INFORMAL": 0,
-                },
-                "resolved_times": [],
-            }
-
-        for ticket in data:
-            if not ticket.resolver:
-                continue
-            stats_item = stats.get(ticket.resolver.email)
-            if not stats_item:
-                continue
-            stats_item["total_assigned"] += 1
-            stats_item["severity_breakdown"][ticket.severity] += 1
-
-            if ticket.status == "Resolved":
-                stats_item["resolved_count"] += 1
-                if now <= ticket.sla_deadline:
-                    stats_item["resolved_within_sla"] += 1
-                else:
-                    stats_item["resolved_outside_sla"] += 1
-                resolution_time = (now - ticket.detected_at).total_seconds() / 3600
-                stats_item["resolved_times"].append(resolution_time)
-            elif ticket.status == "In Progress":
-                stats_item["in_progress_count"] += 1
-            elif ticket.status == "Overdue":
-                stats_item["overdue_count"] += 1
-
-        ranking_list = []
-        for item in stats.values():
-            if item["resolved_times"]:
-                item["avg_resolution_time"] = sum(item["resolved_times"]) / len(item["resolved_times"])
-            if item["resolved_count"] > 0:
-                item["sla_compliance_rate"] = round(
-                    (item["resolved_within_sla"] / item["resolved_count"]) * 100
-                )
-            if item["total_assigned"] > 0:
-                ranking_list.append(item)
-
-        ranking_list.sort(
-            key=lambda x: (
-                -x["resolved_within_sla"],
-                -x["resolved_count"],
-                -x["sla_compliance_rate"],
+        refresh_daily_rollups()
+
+        def render_board():
+            totals = ranking_totals()
+            series = daily_series()
+            return render_template(
+                "partials/ranking_board.html",
+                ranking=ranking_entries(),
+                resolved_trends=trend_for(series, "resolved", totals["total_resolved"]),
+                compliance_trends=trend_for(
+                    series, "compliance", totals["global_sla_compliance"], percent=False, unit=" p.p."
+                ),
+                **totals,
             )
-        )
-
-        total_resolved = len([t for t in data if t.status == "Resolved"])
-        total_in_progress = len([t for t in data if t.status == "In Progress"])
-        total_overdue = len([t for t in data if t.status == "Overdue"])
-        resolved_within_sla = len([t for t in data if t.status == "Resolved" and now <= t.sla_deadline])
-        resolved_outside_sla = total_resolved - resolved_within_sla
-        global_sla_compliance = round((resolved_within_sla / total_resolved) * 100) if total_resolved else 0
 
-        return render_template(
-            "ranking.html",
-            ranking=ranking_list,
-            total_resolved=total_resolved,
-            total_in_progress=total_in_progress,
-            total_overdue=total_overdue,
-            resolved_within_sla=resolved_within_sla,
-            resolved_outside_sla=resolved_outside_sla,
-            global_sla_compliance=global_sla_compliance,
+        board = cached(
+            "ranking_board",
+            ("misconfigurations", "archived_misconfigurations", "resolvers", "daily_rollups"),
+            render_board,
         )
+        return render_template("ranking.html", board=Markup(board))
 
     @app.route("/users", methods=["GET", "POST"])
     @login_required
@@ -343,6 +433,19 @@ def create_app():
                     user.set_password(new_password)
                     db.session.commit()
                     flash("Senha resetada.", "success")
+            elif action == "role":
+                user_id = request.form.get("user_id")
+                role = request.form.get("role")
+                user = User.query.get(int(user_id)) if user_id else None
+                if user and role in ("viewer", "admin") and user.role != role:
+                    if user.username == "lucasadmin":
+                        flash("Não é possível alterar o admin padrão.", "error")
+                    elif user.role == "admin" and User.query.filter_by(role="admin").count() <= 1:
+                        flash("Não é possível rebaixar o último administrador.", "error")
+                    else:
+                        user.role = role
+                        db.session.commit()
+                        flash("Role atualizada.", "success")
             elif action == "delete":
                 user_id = request.form.get("user_id")
                 user = User.query.get(int(user_id)) if user_id else None
@@ -382,23 +485,125 @@ def create_app():
                     flash("Resolvedor adicionado.", "success")
             elif action == "delete_all_tickets":
                 Misconfiguration.query.delete()
+                ArchivedMisconfiguration.query.delete()
+                rebuild_resolver_stats()
                 db.session.commit()
                 flash("Todos os tickets foram removidos.", "success")
             elif action == "import_crowdstrike":
+                limit_raw = request.form.get("limit", "").strip()
                 try:
-                    limit = int(request.form.get("limit", "50"))
+                    limit = int(limit_raw) if limit_raw else None
                 except ValueError:
                     limit = 50
                 filter_query = request.form.get("filter_query") or None
+                full = request.form.get("full_sync") == "1"
+                running = active_job("crowdstrike_sync")
                 try:
-                    imported = fetch_and_import_crowdstrike(limit=limit, filter_query=filter_query)
-                    flash(f"{imported} deteções importadas do CrowdStrike.", "success")
-                except Exception as exc:
+                    crowdstrike_credentials()
+                except RuntimeError as exc:
                     flash(f"Erro ao importar do CrowdStrike: {exc}", "error")
+                    return redirect(url_for("settings"))
+                if running:
+                    flash(f"Já existe uma importação em andamento (job #{running.id}).", "error")
+                else:
+                    job = submit_job("crowdstrike_sync", limit=limit, filter_query=filter_query, full=full)
+                    flash(f"Importação do CrowdStrike iniciada (job #{job.id}).", "success")
+                return redirect(url_for("settings"))
 
         resolvers = Resolver.query.order_by(Resolver.name.asc()).all()
         total_tickets = Misconfiguration.query.count()
-        return render_template("settings.html", resolvers=resolvers, total_tickets=total_tickets)
+        sync_states = SyncState.query.order_by(SyncState.last_synced_at.desc()).all()
+        return render_template(
+            "settings.html",
+            resolvers=resolvers,
+            total_tickets=total_tickets,
+            sync_states=sync_states,
+            jobs=recent_jobs(),
+        )
+
+    @app.route("/api/tickets")
+    @login_required
+    def api_tickets():
+        ensure_overdue_status()
+        fields = parse_fields(request.args.get("fields"), TICKET_FIELDS)
+
+        def build():
+            filters = ticket_filters_from_args(request.args)
+            query = filtered_tickets_query(filters).options(
+                *list_load_options(
+                    [name for name in fields if name != "resolver"],
+                    resolver="resolver" in fields and filters["resolver"] in ("", "unassigned"),
+                )
+            )
+            page = paginate_tickets(
+                query,
+                parse_page_size(request.args.get("page_size")),
+                after=request.args.get("after"),
+                before=request.args.get("before"),
+            )
+            return {
+                "items": [ticket_to_dict(ticket, fields) for ticket in page["items"]],
+                "page_size": page["page_size"],
+                "next_cursor": page["next_cursor"],
+                "previous_cursor": page["previous_cursor"],
+            }
+
+        return conditional_json(("misconfigurations", "resolvers"), build)
+
+    @app.route("/api/metrics")
+    @login_required
+    def api_metrics():
+        ensure_overdue_status()
+
+        def build():
+            counts = [
+                {"severity": severity, "status": status, "count": total}
+                for (severity, status), total in sorted(ticket_counts().items())
+            ]
+            return {"metrics": dashboard_metrics(), "counts": counts}
+
+        return conditional_json(("misconfigurations", "archived_misconfigurations"), build)
+
+    @app.route("/api/ranking")
+    @login_required
+    def api_ranking():
+        ensure_overdue_status()
+        fields = parse_fields(request.args.get("fields"), RANKING_FIELDS)
+
+        def build():
+            return {
+                "ranking": [ranking_entry_to_dict(entry, fields) for entry in ranking_entries()],
+                "totals": ranking_totals(),
+            }
+
+        return conditional_json(("misconfigurations", "archived_misconfigurations", "resolvers"), build)
+
+    @app.route("/api/tickets/bulk", methods=["POST"])
+    @login_required
+    def api_bulk_tickets():
+        payload = request.get_json(silent=True)
+        if not isinstance(payload, dict) or not isinstance(payload.get("ticket_ids"), list):
+            return {"error": "payload inválido"}, 400
+        try:
+            affected = bulk_update_tickets(
+                payload.get("action"),
+                [str(ticket_id) for ticket_id in payload["ticket_ids"]],
+                resolver_id=payload.get("resolver_id"),
+                status=payload.get("status"),
+            )
+        except ValueError as exc:
+            return {"error": str(exc)}, 400
+        return {"action": payload["action"], "affected": affected}
+
+    @app.route("/api/jobs/<int:job_id>")
+    @login_required
+    def job_status(job_id):
+        if not current_user.is_admin:
+            return {"error": "forbidden"}, 403
+        job = db.session.get(Job, job_id)
+        if job is None:
+            return {"error": "not found"}, 404
+        return job_to_dict(job)
 
     @app.route("/resolvers/<int:resolver_id>/delete", methods=["POST"])
     @login_required
@@ -407,13 +612,19 @@ def create_app():
             return redirect(url_for("dashboard"))
 
         resolver = Resolver.query.get_or_404(resolver_id)
-        for ticket in resolver.tickets:
-            ticket.resolver_id = None
+        unassign_resolver_tickets(resolver.id)
         db.session.delete(resolver)
         db.session.commit()
         flash("Resolvedor removido.", "success")
         return redirect(url_for("settings"))
 
+    @app.route("/metrics")
+    def metrics():
+        token = os.getenv("METRICS_TOKEN")
+        if token and request.headers.get("Authorization") != f"Bearer {token}":
+            return {"error": "unauthorized"}, 401
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+
     @app.route("/api/crowdstrike/webhook", methods=["POST"])
     def crowdstrike_webhook():
         token = os.getenv("CROWDSTRIKE_WEBHOOK_TOKEN")
@@ -421,14 +632,28 @@ def create_app():
             return {"error": "unauthorized"}, 401
 
         payload = request.get_json(silent=True) or {}
-        detections = payload.get("resources") or payload.get("detections") or payload
+        detections = payload
+        if isinstance(payload, dict):
+            detections = payload.get("resources") or payload.get("detections") or payload
         if isinstance(detections, dict):
             detections = [detections]
-        if not isinstance(detections, list):
+        if not isinstance(detections, list) or not all(isinstance(det, dict) for det in detections):
             return {"error": "payload inválido"}, 400
-
-        imported = import_crowdstrike_detections(detections)
-        return {"imported": imported}, 200
+        # Validated before the 202: after it, a bad detection could only fail
+        # the batch it is imported with.
+        for index, det in enumerate(detections):
+            try:
+                row = detection_to_row(det)
+            except (AttributeError, TypeError, ValueError):
+                row = None
+            if row is None:
+                return {"error": "detecção inválida", "index": index}, 400
+
+        key = idempotency_key(request.headers, request.get_data())
+        outcome = enqueue_detections(app, key, detections)
+        if outcome == "full":
+            return {"error": "fila cheia"}, 503, {"Retry-After": str(RETRY_AFTER_SECONDS)}
+        return {"status": outcome, "queued": len(detections) if outcome == "queued" else 0}, 202
 
     return app
 
@@ -0,0 +1,95 @@
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, literal, select, union_all
+
+from models import db, Misconfiguration, ArchivedMisconfiguration
+
+
+# Resolved tickets older than this move to archived_misconfigurations, so the
+# working table (list, search, SLA sweep) stays sized to the open backlog.
+ARCHIVE_AFTER_DAYS = int(os.getenv("ARCHIVE_AFTER_DAYS", "90"))
+ARCHIVE_BATCH_SIZE = 1000
+
+ARCHIVED_COLUMNS = (
+    "ticket_id",
+    "severity",
+    "provider",
+    "resource",
+    "description",
+    "resolver_id",
+    "status",
+    "sla_deadline",
+    "detected_at",
+    "crowdstrike_id",
+    "resolved_at",
+)
+
+archive_table = ArchivedMisconfiguration.__table__
+tickets_table = Misconfiguration.__table__
+
+
+def ticket_history(*names):
+    # Hot and archived tickets as one selectable, for aggregates that must
+    # keep counting archived work (ranking, daily rollups).
+    return union_all(
+        select(*(tickets_table.c[name] for name in names)),
+        select(*(archive_table.c[name] for name in names)),
+    ).subquery("ticket_history")
+
+
+def archive_resolved_tickets(older_than_days=None, progress=None):
+    # Rows are copied and deleted in batches by primary key. Resolver
+    # statistics already count these tickets and must keep doing so; the
+    # DELETE is a Core statement, so the ranking mapper events do not fire.
+    days = ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    resolved_at = func.coalesce(Misconfiguration.resolved_at, Misconfiguration.detected_at)
+
+    archived = 0
+    while True:
+        ids = list(
+            db.session.scalars(
+                select(Misconfiguration.id)
+                .where(Misconfiguration.status == "Resolved", resolved_at < cutoff)
+                .order_by(Misconfiguration.id)
+                .limit(ARCHIVE_BATCH_SIZE)
+            )
+        )
+        if not ids:
+            break
+
+        db.session.execute(
+            insert(archive_table).from_select(
+                [*ARCHIVED_COLUMNS, "source_id", "archived_at"],
+                select(
+                    *(tickets_table.c[name] for name in ARCHIVED_COLUMNS),
+                    tickets_table.c.id,
+                    literal(datetime.utcnow(), archive_table.c.archived_at.type),
+                ).where(tickets_table.c.id.in_(ids)),
+            )
+        )
+        db.session.execute(delete(tickets_table).where(tickets_table.c.id.in_(ids)))
+        db.session.commit()
+        archived += len(ids)
+        if progress:
+            progress(archived)
+    return archived
+
+
+def archived_crowdstrike_ids(crowdstrike_ids):
+    return set(
+        db.session.scalars(
+            select(ArchivedMisconfiguration.crowdstrike_id).where(
+                ArchivedMisconfiguration.crowdstrike_id.in_(crowdstrike_ids)
+            )
+        )
+    )
+
+
+def archived_ticket_ids(ticket_ids):
+    return set(
+        db.session.scalars(
+            select(ArchivedMisconfiguration.ticket_id).where(ArchivedMisconfiguration.ticket_id.in_(ticket_ids))
+        )
+    )
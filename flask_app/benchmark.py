@@ -0,0 +1,237 @@
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import statistics
+import tempfile
+import time
+from datetime import datetime
+
+
+# Benchmarks the web views and both ingest paths against a generated dataset
+# in a throwaway database, with crowdstrike_stub standing in for the API.
+# Everything that reads the environment at import time is configured before
+# the app modules are imported.
+
+WEB_TARGETS = [
+    ("dashboard", "/"),
+    ("misconfigurations", "/misconfigurations"),
+    ("misconfigurations_filtered", "/misconfigurations?severity=CRITICAL&severity=HIGH&status=Open"),
+    ("misconfigurations_search", "/misconfigurations?search=bucket"),
+    ("misconfigurations_resolver", "/misconfigurations?resolver=resolver0001"),
+    ("misconfigurations_page_200", "/misconfigurations?page_size=200&provider=AWS"),
+    ("ranking", "/ranking"),
+    ("api_tickets", "/api/tickets?page_size=100"),
+    ("api_metrics", "/api/metrics"),
+]
+
+BENCHMARK_USER = "benchmark"
+BENCHMARK_PASSWORD = "benchmark-password"
+
+
+def summarize(latencies, items=None):
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    result = {
+        "iterations": len(latencies),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "p95_ms": round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3),
+        "per_second": round(len(latencies) / total, 2) if total else None,
+    }
+    if items is not None:
+        result["items"] = items
+        result["items_per_second"] = round(items / total, 2) if total else None
+    return result
+
+
+def timed(func):
+    start = time.perf_counter()
+    value = func()
+    return time.perf_counter() - start, value
+
+
+def bench_web(client, iterations, warmup):
+    results = {}
+    for name, path in WEB_TARGETS:
+        for _ in range(warmup):
+            client.get(path)
+        latencies = []
+        for _ in range(iterations):
+            elapsed, response = timed(lambda: client.get(path))
+            if response.status_code != 200:
+                raise RuntimeError(f"{path} respondeu {response.status_code}")
+            latencies.append(elapsed)
+        results[name] = summarize(latencies)
+    return results
+
+
+def _relabel(detections, prefix):
+    return [dict(det, detection_id=f"{prefix}:{det['detection_id']}") for det in detections]
+
+
+def bench_import(app, make_detections, count, batch_size):
+    from utils import import_crowdstrike_detections
+
+    detections = _relabel(make_detections(count, seed=7), "bench-import")
+    latencies = []
+    with app.app_context():
+        for i in range(0, len(detections), batch_size):
+            batch = detections[i : i + batch_size]
+            elapsed, _ = timed(lambda: import_crowdstrike_detections(batch))
+            latencies.append(elapsed)
+        # A second pass measures the duplicate-skipping path.
+        elapsed, counts = timed(lambda: import_crowdstrike_detections(detections))
+    result = summarize(latencies, items=len(detections))
+    result["reimport_ms"] = round(elapsed * 1000, 3)
+    result["reimport_skipped"] = counts["skipped"]
+    return result
+
+
+def bench_webhook(client, make_detections, count, batch_size):
+    from ingest_queue import wait_for_ingest_queue
+
+    detections = _relabel(make_detections(count, seed=11), "bench-webhook")
+    latencies = []
+    start = time.perf_counter()
+    for i in range(0, len(detections), batch_size):
+        payload = {"resources": detections[i : i + batch_size]}
+        elapsed, response = timed(lambda: client.post("/api/crowdstrike/webhook", json=payload))
+        if response.status_code != 202:
+            raise RuntimeError(f"webhook respondeu {response.status_code}")
+        latencies.append(elapsed)
+    wait_for_ingest_queue(timeout=300)
+    drained = time.perf_counter() - start
+
+    result = summarize(latencies, items=len(detections))
+    result["drained_ms"] = round(drained * 1000, 3)
+    result["ingested_per_second"] = round(len(detections) / drained, 2)
+    return result
+
+
+def bench_sync(app, count):
+    from crowdstrike import sync_crowdstrike
+
+    with app.app_context():
+        elapsed, counts = timed(lambda: sync_crowdstrike(full=True))
+    return {
+        "detections": count,
+        "elapsed_ms": round(elapsed * 1000, 3),
+        "items_per_second": round(counts["inserted"] / elapsed, 2) if elapsed else None,
+        "counts": counts,
+    }
+
+
+def compare(current, baseline_path):
+    with open(baseline_path, encoding="utf-8") as baseline_file:
+        baseline = json.load(baseline_file)
+
+    print(f"\nComparação com {baseline_path}:")
+    for group, entries in current["results"].items():
+        for name, values in entries.items():
+            before = baseline.get("results", {}).get(group, {}).get(name)
+            if not before:
+                continue
+            for metric in ("mean_ms", "p95_ms", "elapsed_ms", "drained_ms"):
+                if metric in values and before.get(metric):
+                    change = (values[metric] - before[metric]) / before[metric] * 100
+                    print(f"  {group}.{name}.{metric}: {before[metric]} -> {values[metric]} ({change:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark das telas e da ingestão do CSPM Tracker.")
+    parser.add_argument("--tickets", type=int, default=10000)
+    parser.add_argument("--resolvers", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--import-detections", type=int, default=5000)
+    parser.add_argument("--webhook-detections", type=int, default=5000)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--sync-detections", type=int, default=2000)
+    parser.add_argument("--database", help="arquivo SQLite a usar (padrão: temporário)")
+    parser.add_argument("--output", help="arquivo JSON de resultados")
+    parser.add_argument("--compare", help="resultado JSON anterior para comparação")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="cspm-bench-")
+    database = args.database or os.path.join(workdir, "bench.db")
+    os.environ["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{os.path.abspath(database)}"
+    os.environ.setdefault("CROWDSTRIKE_MAX_RPS", "1000")
+    os.environ.setdefault("CROWDSTRIKE_CLIENT_ID", "benchmark")
+    os.environ.setdefault("CROWDSTRIKE_CLIENT_SECRET", "benchmark")
+    os.environ.pop("CROWDSTRIKE_WEBHOOK_TOKEN", None)
+    os.environ["CROWDSTRIKE_SYNC_INTERVAL"] = "0"
+    # Views are timed uncached unless a backend is chosen explicitly.
+    os.environ.setdefault("CACHE_BACKEND", "none")
+    os.environ["AUTO_INIT_DB"] = "0"
+
+    from crowdstrike_stub import make_detections, start_stub_server
+
+    server, base_url = start_stub_server(detections=args.sync_detections)
+    os.environ["CROWDSTRIKE_BASE_URL"] = base_url
+
+    from app import create_app, init_db
+    from datagen import generate_dataset
+    from models import db, User
+
+    app = create_app()
+    # Seed markers and reports stay in the workdir, and the marker keeps the
+    # random mock tickets out of the measured dataset.
+    app.instance_path = workdir
+    os.makedirs(os.path.join(workdir, "data"), exist_ok=True)
+    with open(os.path.join(workdir, "data", ".seeded_mock_data"), "w", encoding="utf-8") as marker_file:
+        marker_file.write("benchmark\n")
+    init_db(app)
+    with app.app_context():
+        elapsed, generated = timed(
+            lambda: generate_dataset(args.tickets, args.resolvers, seed=args.seed)
+        )
+        if not User.query.filter_by(username=BENCHMARK_USER).first():
+            user = User(username=BENCHMARK_USER, role="admin")
+            user.set_password(BENCHMARK_PASSWORD)
+            db.session.add(user)
+            db.session.commit()
+    print(f"Dataset: {generated['tickets']} tickets em {elapsed:.1f}s")
+
+    client = app.test_client()
+    client.post("/login", data={"username": BENCHMARK_USER, "password": BENCHMARK_PASSWORD})
+
+    results = {"web": bench_web(client, args.iterations, args.warmup)}
+    results["ingest"] = {
+        "import_crowdstrike_detections": bench_import(
+            app, make_detections, args.import_detections, args.batch_size
+        ),
+        "webhook": bench_webhook(client, make_detections, args.webhook_detections, args.batch_size),
+        "crowdstrike_sync": bench_sync(app, args.sync_detections),
+    }
+    server.shutdown()
+
+    report = {
+        "created_at": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "parameters": vars(args),
+        "results": results,
+    }
+    output = args.output or os.path.join(
+        app.instance_path, "benchmarks", f"benchmark-{datetime.utcnow():%Y%m%d-%H%M%S}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as output_file:
+        json.dump(report, output_file, indent=2)
+
+    for group, entries in results.items():
+        for name, values in entries.items():
+            summary = values.get("mean_ms", values.get("elapsed_ms"))
+            print(f"{group}.{name}: {summary} ms")
+    print(f"Resultados salvos em {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+from datetime import datetime
+
+from sqlalchemy import case, delete, select, update
+
+from models import db, Resolver, Misconfiguration, ArchivedMisconfiguration
+from ranking import rebuild_resolver_stats, release_resolver_stats
+from sla import invalidate as invalidate_sla_deadline
+from utils import STATUSES
+
+
+BULK_ACTIONS = ("assign", "status", "delete")
+
+
+def _selected_resolver_ids(ticket_ids):
+    return set(
+        db.session.scalars(
+            select(Misconfiguration.resolver_id)
+            .where(Misconfiguration.ticket_id.in_(ticket_ids))
+            .distinct()
+        )
+    )
+
+
+def bulk_update_tickets(action, ticket_ids, resolver_id=None, status=None):
+    # One set-based statement per action. The statements bypass the mapper
+    # events, so resolver statistics are rebuilt for every resolver involved
+    # in the same transaction instead.
+    if action not in BULK_ACTIONS:
+        raise ValueError("ação inválida")
+    ticket_ids = sorted(set(ticket_ids))
+    if not ticket_ids:
+        return 0
+
+    selected = Misconfiguration.ticket_id.in_(ticket_ids)
+    affected_resolvers = _selected_resolver_ids(ticket_ids)
+
+    if action == "assign":
+        if resolver_id is not None:
+            try:
+                resolver_id = int(resolver_id)
+            except (TypeError, ValueError):
+                raise ValueError("resolvedor inválido")
+            if db.session.get(Resolver, resolver_id) is None:
+                raise ValueError("resolvedor não encontrado")
+        statement = update(Misconfiguration).where(selected).values(resolver_id=resolver_id)
+        affected_resolvers.add(resolver_id)
+    elif action == "status":
+        if status not in STATUSES:
+            raise ValueError("status inválido")
+        if status == "Resolved":
+            resolved_at = case(
+                (Misconfiguration.status == "Resolved", Misconfiguration.resolved_at),
+                else_=datetime.utcnow(),
+            )
+        else:
+            resolved_at = None
+        statement = (
+            update(Misconfiguration)
+            .where(selected)
+            .values(status=status, resolved_at=resolved_at)
+        )
+    else:
+        statement = delete(Misconfiguration).where(selected)
+
+    result = db.session.execute(statement, execution_options={"synchronize_session": False})
+    rebuild_resolver_stats(affected_resolvers)
+    db.session.commit()
+
+    if action == "status" and status in ("Open", "In Progress"):
+        invalidate_sla_deadline()
+    return result.rowcount
+
+
+def unassign_resolver_tickets(resolver_id):
+    release_resolver_stats(resolver_id)
+    # Archived tickets reference the resolver too.
+    db.session.execute(
+        update(ArchivedMisconfiguration)
+        .where(ArchivedMisconfiguration.resolver_id == resolver_id)
+        .values(resolver_id=None),
+        execution_options={"synchronize_session": False},
+    )
+    result = db.session.execute(
+        update(Misconfiguration)
+        .where(Misconfiguration.resolver_id == resolver_id)
+        .values(resolver_id=None),
+        execution_options={"synchronize_session": False},
+    )
+    return result.rowcount
@@ -0,0 +1,178 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+from sqlalchemy import event
+from sqlalchemy.orm import make_transient_to_detached
+
+from models import db, User
+from versions import table_versions
+
+
+# "memory" keeps entries per process; "sqlite" shares them between workers
+# through a small database next to app.db; "none" disables caching.
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_TTL_SECONDS = float(os.getenv("CACHE_TTL_SECONDS", "300"))
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "256"))
+CACHE_PATH = os.getenv("CACHE_PATH")
+
+# Identity of logged-in users, per process. Changes made through this process
+# evict the entry immediately; other workers see them after the TTL at most.
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "60"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "1024"))
+
+
+class MemoryCache:
+    def __init__(self, max_entries, ttl):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SqliteCache:
+    def __init__(self, path, max_entries, ttl):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        with self._connect() as connection:
+            connection.execute("PRAGMA journal_mode = WAL")
+            columns = {row[1] for row in connection.execute("PRAGMA table_info(cache_entries)")}
+            if columns and "last_used" not in columns:
+                # Created by an older version; the entries are disposable.
+                connection.execute("DROP TABLE cache_entries")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS cache_entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, "
+                "last_used REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=5)
+
+    def get(self, key):
+        now = time.time()
+        with self._connect() as connection:
+            row = connection.execute(
+                "SELECT value FROM cache_entries WHERE key = ? AND expires_at >= ?",
+                (key, now),
+            ).fetchone()
+            if row:
+                # Eviction is least recently used, like MemoryCache.
+                connection.execute("UPDATE cache_entries SET last_used = ? WHERE key = ?", (now, key))
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value):
+        now = time.time()
+        with self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO cache_entries (key, value, expires_at, last_used) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now + self.ttl, now),
+            )
+            connection.execute("DELETE FROM cache_entries WHERE expires_at < ?", (now,))
+            connection.execute(
+                "DELETE FROM cache_entries WHERE key NOT IN "
+                "(SELECT key FROM cache_entries ORDER BY last_used DESC LIMIT ?)",
+                (self.max_entries,),
+            )
+
+    def delete(self, key):
+        with self._connect() as connection:
+            connection.execute("DELETE FROM cache_entries WHERE key = ?", (key,))
+
+    def clear(self):
+        with self._connect() as connection:
+            connection.execute("DELETE FROM cache_entries")
+
+
+_cache = {"backend": None}
+
+
+def init_cache(instance_path):
+    if CACHE_BACKEND == "none":
+        backend = None
+    elif CACHE_BACKEND == "sqlite":
+        path = CACHE_PATH or os.path.join(instance_path, "data", "cache.db")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        backend = SqliteCache(path, CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+    else:
+        backend = MemoryCache(CACHE_MAX_ENTRIES, CACHE_TTL_SECONDS)
+    _cache["backend"] = backend
+    return backend
+
+
+def get_cache():
+    return _cache["backend"]
+
+
+def cached(name, tables, compute):
+    # Keys embed the change counters of the tables the value is derived from,
+    # so any committed write to them makes older entries unreachable.
+    backend = get_cache()
+    if backend is None:
+        return compute()
+    versions, _ = table_versions(*tables)
+    key = f"{name}:{'.'.join(str(version) for version in versions)}"
+    value = backend.get(key)
+    if value is None:
+        value = compute()
+        backend.set(key, value)
+    return value
+
+
+_users = MemoryCache(USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS)
+_user_columns = [column.key for column in User.__table__.columns]
+
+
+def load_cached_user(user_id):
+    values = _users.get(user_id) if USER_CACHE_TTL_SECONDS > 0 else None
+    if values is None:
+        user = db.session.get(User, user_id)
+        if user is not None and USER_CACHE_TTL_SECONDS > 0:
+            _users.set(user_id, {name: getattr(user, name) for name in _user_columns})
+        return user
+
+    # Rebuilt from the cached columns and attached without a SELECT.
+    user = User(**values)
+    make_transient_to_detached(user)
+    return db.session.merge(user, load=False)
+
+
+def invalidate_user(user_id):
+    _users.delete(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _evict_user(mapper, connection, target):
+    invalidate_user(target.id)
@@ -0,0 +1,275 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import increment
+from models import db, SyncState
+from utils import import_crowdstrike_detections, parse_timestamp
+
+
+SUMMARY_CHUNK_SIZE = 100
+QUERY_PAGE_SIZE = 500
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+FETCH_WORKERS = int(os.getenv("CROWDSTRIKE_FETCH_WORKERS", "4"))
+MAX_RETRIES = int(os.getenv("CROWDSTRIKE_MAX_RETRIES", "4"))
+BACKOFF_SECONDS = float(os.getenv("CROWDSTRIKE_BACKOFF_SECONDS", "0.5"))
+MAX_REQUESTS_PER_SECOND = float(os.getenv("CROWDSTRIKE_MAX_RPS", "10"))
+
+# Tokens are refreshed this many seconds before CrowdStrike says they expire.
+TOKEN_REFRESH_MARGIN = 60
+
+
+class RateLimiter:
+    def __init__(self, per_second):
+        self.interval = 1.0 / per_second if per_second > 0 else 0
+        self._next_slot = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            delay = self._next_slot - now
+            self._next_slot = max(now, self._next_slot) + self.interval
+        if delay > 0:
+            time.sleep(delay)
+
+
+_rate_limiter = RateLimiter(MAX_REQUESTS_PER_SECOND)
+_session = None
+_session_lock = threading.Lock()
+_token_cache = {"key": None, "access_token": None, "expires_at": 0.0}
+_token_lock = threading.Lock()
+
+
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max(FETCH_WORKERS, 1))
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _retry_delay(response, attempt):
+    retry_after = response.headers.get("Retry-After") if response is not None else None
+    if retry_after:
+        try:
+            return max(float(retry_after), 0)
+        except ValueError:
+            pass
+    return BACKOFF_SECONDS * (2 ** attempt)
+
+
+def crowdstrike_request(method, url, **kwargs):
+    for attempt in range(MAX_RETRIES + 1):
+        _rate_limiter.wait()
+        try:
+            response = get_session().request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            increment("crowdstrike_requests_total", status="error")
+            if attempt == MAX_RETRIES:
+                raise
+            time.sleep(_retry_delay(None, attempt))
+            continue
+        increment("crowdstrike_requests_total", status=response.status_code)
+        if response.status_code not in RETRY_STATUSES or attempt == MAX_RETRIES:
+            break
+        time.sleep(_retry_delay(response, attempt))
+    response.raise_for_status()
+    return response
+
+
+def crowdstrike_credentials():
+    base_url = os.getenv("CROWDSTRIKE_BASE_URL", "https://api.crowdstrike.com")
+    client_id = os.getenv("CROWDSTRIKE_CLIENT_ID")
+    client_secret = os.getenv("CROWDSTRIKE_CLIENT_SECRET")
+    if not client_id or not client_secret:
+        raise RuntimeError("Credenciais do CrowdStrike não configuradas.")
+    return base_url.rstrip("/"), client_id, client_secret
+
+
+def get_crowdstrike_token(base_url, client_id, client_secret, stale_token=None):
+    key = (base_url, client_id)
+    # Holding the lock while fetching means concurrent callers wait for one
+    # refresh instead of each requesting their own token.
+    with _token_lock:
+        cached = _token_cache["access_token"]
+        if (
+            _token_cache["key"] == key
+            and cached
+            and cached != stale_token
+            and time.monotonic() < _token_cache["expires_at"]
+        ):
+            return cached
+
+        response = crowdstrike_request(
+            "POST",
+            f"{base_url}/oauth2/token",
+            data={"client_id": client_id, "client_secret": client_secret},
+            timeout=15,
+        )
+        body = response.json()
+        expires_in = float(body.get("expires_in") or 0)
+        _token_cache["key"] = key
+        _token_cache["access_token"] = body.get("access_token")
+        _token_cache["expires_at"] = time.monotonic() + max(expires_in - TOKEN_REFRESH_MARGIN, 0)
+        return _token_cache["access_token"]
+
+
+def authorized_request(credentials, method, path, **kwargs):
+    base_url, client_id, client_secret = credentials
+    token = get_crowdstrike_token(base_url, client_id, client_secret)
+    try:
+        return crowdstrike_request(
+            method, f"{base_url}{path}", headers={"Authorization": f"Bearer {token}"}, **kwargs
+        )
+    except requests.HTTPError as exc:
+        if exc.response is None or exc.response.status_code != 401:
+            raise
+    token = get_crowdstrike_token(base_url, client_id, client_secret, stale_token=token)
+    return crowdstrike_request(
+        method, f"{base_url}{path}", headers={"Authorization": f"Bearer {token}"}, **kwargs
+    )
+
+
+def iter_crowdstrike_detect_id_pages(
+    credentials, limit=None, filter_query=None, sort=None, page_size=QUERY_PAGE_SIZE
+):
+    fetched = 0
+    offset = 0
+    after = None
+    while limit is None or fetched < limit:
+        params = {"limit": page_size if limit is None else min(page_size, limit - fetched)}
+        if filter_query:
+            params["filter"] = filter_query
+        if sort:
+            params["sort"] = sort
+        if after:
+            params["after"] = after
+        elif offset:
+            params["offset"] = offset
+
+        response = authorized_request(
+            credentials, "GET", "/detects/queries/detects/v1", params=params, timeout=15
+        )
+        body = response.json()
+        detect_ids = body.get("resources", []) or []
+        if not detect_ids:
+            return
+        fetched += len(detect_ids)
+
+        pagination = (body.get("meta") or {}).get("pagination") or {}
+        after = pagination.get("after")
+        if after:
+            yield detect_ids, after
+            continue
+        offset = int(pagination.get("offset") or offset) + len(detect_ids)
+        yield detect_ids, str(offset)
+        total = pagination.get("total")
+        if total is not None and offset >= int(total):
+            return
+
+
+def get_crowdstrike_detect_summaries(credentials, detect_ids):
+    chunks = [
+        detect_ids[i : i + SUMMARY_CHUNK_SIZE] for i in range(0, len(detect_ids), SUMMARY_CHUNK_SIZE)
+    ]
+    if not chunks:
+        return []
+
+    def fetch(chunk):
+        response = authorized_request(
+            credentials,
+            "GET",
+            "/detects/entities/summaries/GET",
+            params={"ids": ",".join(chunk)},
+            timeout=20,
+        )
+        return response.json().get("resources", []) or []
+
+    summaries = []
+    with ThreadPoolExecutor(max_workers=max(min(FETCH_WORKERS, len(chunks)), 1)) as executor:
+        for resources in executor.map(fetch, chunks):
+            summaries.extend(resources)
+    return summaries
+
+
+def iter_crowdstrike_detection_pages(credentials, limit=None, filter_query=None, sort=None):
+    for detect_ids, cursor in iter_crowdstrike_detect_id_pages(
+        credentials, limit=limit, filter_query=filter_query, sort=sort
+    ):
+        yield get_crowdstrike_detect_summaries(credentials, detect_ids), cursor
+
+
+def fetch_and_import_crowdstrike(limit=50, filter_query=None, sort=None, on_page=None):
+    credentials = crowdstrike_credentials()
+    counts = {"inserted": 0, "skipped": 0, "updated": 0}
+    # Each page is committed by import_crowdstrike_detections() before the
+    # next one is requested, so memory stays bounded by the page size.
+    for summaries, cursor in iter_crowdstrike_detection_pages(
+        credentials, limit=limit, filter_query=filter_query, sort=sort
+    ):
+        page_counts = import_crowdstrike_detections(summaries)
+        for name, value in page_counts.items():
+            counts[name] += value
+        if on_page:
+            on_page(summaries, cursor, counts)
+    return counts
+
+
+def sync_state_key(filter_query=None):
+    return f"crowdstrike:detections:{filter_query or ''}"[:255]
+
+
+def incremental_filter(filter_query, last_created_timestamp):
+    if not last_created_timestamp:
+        return filter_query
+    # >= rather than > so detections sharing the boundary timestamp are not
+    # lost; the few repeats are dropped by the ingest deduplication. In FQL
+    # "+" (AND) binds tighter than "," (OR), so the user's filter is grouped.
+    newer = f"created_timestamp:>='{last_created_timestamp}'"
+    return f"({filter_query})+{newer}" if filter_query else newer
+
+
+def sync_crowdstrike(limit=None, filter_query=None, full=False, progress=None):
+    key = sync_state_key(filter_query)
+    state = db.session.get(SyncState, key) or SyncState(name=key)
+    high_water_mark = None if full else state.last_created_timestamp
+
+    # Pages are sorted by created_timestamp and the high-water mark is saved
+    # after each one, so an interrupted sync resumes from it; a paging cursor
+    # would not carry over, since the filter changes with the mark.
+    def checkpoint(summaries, cursor, counts):
+        timestamps = [det.get("created_timestamp") for det in summaries if det.get("created_timestamp")]
+        if timestamps:
+            newest = max(timestamps, key=parse_timestamp)
+            if not state.last_created_timestamp or parse_timestamp(newest) > parse_timestamp(
+                state.last_created_timestamp
+            ):
+                state.last_created_timestamp = newest
+        db.session.add(state)
+        db.session.commit()
+        if progress:
+            progress(counts)
+
+    counts = fetch_and_import_crowdstrike(
+        limit=limit,
+        filter_query=incremental_filter(filter_query, high_water_mark),
+        sort="created_timestamp.asc",
+        on_page=checkpoint,
+    )
+    state.last_synced_at = datetime.utcnow()
+    db.session.add(state)
+    db.session.commit()
+    return counts
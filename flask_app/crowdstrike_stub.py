@@ -0,0 +1,166 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+
+# Local stand-in for the parts of the CrowdStrike detects API used by
+# crowdstrike.py, for development and benchmarks without real credentials.
+
+STUB_TOKEN = "stub-token"
+HOSTNAMES = ["web-01", "db-primary", "k8s-node-07", "bastion", "payments-lambda", "vpn-gw"]
+BEHAVIORS = [
+    "Suspicious PowerShell execution",
+    "Credential dumping attempt",
+    "Unexpected outbound connection",
+    "Privilege escalation via sudo",
+    "Cryptominer process detected",
+]
+PLATFORMS = ["aws", "gcp", "azure"]
+
+
+def make_detections(count, seed=42):
+    rng = random.Random(seed)
+    start = datetime.utcnow() - timedelta(days=30)
+    step = timedelta(days=30) / max(count, 1)
+    detections = []
+    for i in range(count):
+        created = start + step * i
+        detections.append(
+            {
+                "detection_id": f"ldt:stub:{i:08d}",
+                "max_severity": rng.choice([10, 30, 50, 75, 95]),
+                "created_timestamp": created.strftime("%Y-%m-%dT%H:%M:%S.%fZ"),
+                "status": rng.choice(["new", "new", "in_progress", "closed"]),
+                "cloud_platform": rng.choice(PLATFORMS),
+                "device": {"hostname": f"{rng.choice(HOSTNAMES)}-{rng.randint(1, 99):02d}"},
+                "behaviors": [{"description": rng.choice(BEHAVIORS)}],
+            }
+        )
+    return detections
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so clients can reuse pooled connections as with the real API.
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=None, headers=None):
+        payload = json.dumps(body or {}).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _authorized(self):
+        return self.headers.get("Authorization") == f"Bearer {self.server.token}"
+
+    def _throttled(self):
+        stub = self.server
+        with stub.lock:
+            stub.request_count += 1
+            count = stub.request_count
+            stub.request_times.append(time.monotonic())
+            stub.client_ports.add(self.client_address[1])
+        if stub.latency:
+            time.sleep(stub.latency)
+        if stub.fail_every and count % stub.fail_every == 0:
+            if stub.fail_status == 429:
+                self._send(429, {"errors": [{"message": "rate limited"}]}, {"Retry-After": "0"})
+            else:
+                self._send(stub.fail_status, {"errors": [{"message": "internal error"}]})
+            return True
+        return False
+
+    def do_POST(self):
+        # The body must be consumed for the connection to be reused.
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if urlparse(self.path).path != "/oauth2/token":
+            return self._send(404)
+        with self.server.lock:
+            self.server.token_requests += 1
+        self._send(201, {"access_token": self.server.token, "expires_in": self.server.token_ttl})
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        params = parse_qs(url.query)
+        if not self._authorized():
+            return self._send(401, {"errors": [{"message": "access denied"}]})
+        if self._throttled():
+            return
+
+        if url.path == "/detects/queries/detects/v1":
+            limit = int(params.get("limit", ["100"])[0])
+            offset = int(params.get("offset", ["0"])[0] or 0)
+            detections = self.server.detections
+            newer = re.search(r"created_timestamp:>=?'([^']+)'", params.get("filter", [""])[0])
+            if newer:
+                detections = [det for det in detections if det["created_timestamp"] >= newer.group(1)]
+            if params.get("sort", [""])[0] == "created_timestamp.desc":
+                detections = list(reversed(detections))
+            ids = [det["detection_id"] for det in detections]
+            page = ids[offset : offset + limit]
+            return self._send(
+                200,
+                {
+                    "meta": {"pagination": {"offset": offset, "limit": limit, "total": len(ids)}},
+                    "resources": page,
+                },
+            )
+
+        if url.path == "/detects/entities/summaries/GET":
+            wanted = ",".join(params.get("ids", [])).split(",")
+            resources = [self.server.by_id[i] for i in wanted if i in self.server.by_id]
+            return self._send(200, {"resources": resources})
+
+        self._send(404)
+
+
+def start_stub_server(port=0, detections=1000, fail_every=0, latency=0.0, token_ttl=1799, fail_status=429):
+    server = ThreadingHTTPServer(("127.0.0.1", port), StubHandler)
+    server.daemon_threads = True
+    server.detections = make_detections(detections)
+    server.by_id = {det["detection_id"]: det for det in server.detections}
+    server.fail_every = fail_every
+    server.fail_status = fail_status
+    server.latency = latency
+    server.token = STUB_TOKEN
+    server.token_ttl = token_ttl
+    server.token_requests = 0
+    server.request_count = 0
+    server.request_times = []
+    server.client_ports = set()
+    server.lock = threading.Lock()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local que simula a API de detecções do CrowdStrike.")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--detections", type=int, default=1000)
+    parser.add_argument("--fail-every", type=int, default=0, help="responde com erro a cada N requisições")
+    parser.add_argument("--fail-status", type=int, default=429, help="status das respostas de erro (429 ou 5xx)")
+    parser.add_argument("--latency", type=float, default=0.0, help="atraso por requisição, em segundos")
+    args = parser.parse_args()
+
+    server, base_url = start_stub_server(
+        args.port, args.detections, args.fail_every, args.latency, fail_status=args.fail_status
+    )
+    print(f"Stub do CrowdStrike em {base_url} (CROWDSTRIKE_BASE_URL)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
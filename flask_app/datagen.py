@@ -0,0 +1,112 @@
+import random
+from datetime import datetime, timedelta
+
+from models import db, Resolver, Misconfiguration
+from ranking import rebuild_resolver_stats
+from sla import invalidate as invalidate_sla_deadline
+from utils import (
+    SLA_HOURS,
+    SEVERITIES,
+    PROVIDERS,
+    RESOURCES,
+    DESCRIPTIONS,
+    calculate_sla_deadline,
+    insert_ignoring_conflicts,
+)
+
+
+# Rough shape of a real CSPM backlog: few criticals, mostly medium/low,
+# AWS-heavy, and a long tail of resolvers owning most of the work.
+SEVERITY_WEIGHTS = [4, 16, 35, 30, 15]
+PROVIDER_WEIGHTS = [55, 25, 20]
+UNASSIGNED_RATE = 0.15
+IN_PROGRESS_RATE = 0.2
+# Tickets go out as executemany batches, which have no bound-parameter limit.
+GENERATE_CHUNK_SIZE = 5000
+
+
+def _resolution_probability(age_hours, sla_hours):
+    return min(0.95, 0.25 + 0.7 * age_hours / (sla_hours * 2))
+
+
+def generate_resolvers(count, rng):
+    rows = [
+        {"name": f"Resolver {i:04d}", "email": f"resolver{i:04d}@example.com"}
+        for i in range(count)
+    ]
+    if rows:
+        db.session.execute(insert_ignoring_conflicts(Resolver.__table__), rows)
+    emails = [row["email"] for row in rows]
+    resolver_ids = list(db.session.scalars(db.select(Resolver.id).where(Resolver.email.in_(emails))))
+    rng.shuffle(resolver_ids)
+    # Zipf-like weights: the first resolvers in the shuffled list take most tickets.
+    weights = [1 / (rank + 1) for rank in range(len(resolver_ids))]
+    return resolver_ids, weights
+
+
+def generate_ticket(index, rng, now, days, resolver_ids, weights, seed):
+    severity = rng.choices(SEVERITIES, SEVERITY_WEIGHTS)[0]
+    detected_at = now - timedelta(seconds=rng.random() ** 1.5 * days * 86400)
+    sla_deadline = calculate_sla_deadline(severity, detected_at)
+    sla_hours = SLA_HOURS[severity]
+    age_hours = (now - detected_at).total_seconds() / 3600
+
+    resolved_at = None
+    if rng.random() < _resolution_probability(age_hours, sla_hours):
+        # Most fixes land inside the SLA; the rest overshoot it by up to 2x.
+        resolution_hours = rng.triangular(0.05, 2.0, 0.5) * sla_hours
+        if detected_at + timedelta(hours=resolution_hours) <= now:
+            resolved_at = detected_at + timedelta(hours=resolution_hours)
+
+    if resolved_at:
+        status = "Resolved"
+    elif sla_deadline < now:
+        status = "Overdue"
+    elif rng.random() < IN_PROGRESS_RATE:
+        status = "In Progress"
+    else:
+        status = "Open"
+
+    resolver_id = None
+    if resolver_ids and (status == "In Progress" or rng.random() >= UNASSIGNED_RATE):
+        resolver_id = rng.choices(resolver_ids, weights)[0]
+
+    return {
+        "ticket_id": f"GEN{seed}-{index:07d}",
+        "severity": severity,
+        "provider": rng.choices(PROVIDERS, PROVIDER_WEIGHTS)[0],
+        "resource": f"{rng.choice(RESOURCES)}-{rng.randint(1, 500):03d}",
+        "description": rng.choice(DESCRIPTIONS),
+        "resolver_id": resolver_id,
+        "status": status,
+        "sla_deadline": sla_deadline,
+        "detected_at": detected_at,
+        "crowdstrike_id": f"CS-GEN{seed}-{index:07d}",
+        "resolved_at": resolved_at,
+    }
+
+
+def generate_dataset(tickets=10000, resolvers=50, seed=42, days=180, progress=None):
+    # Rows are inserted with INSERT ... ON CONFLICT DO NOTHING, so a
+    # rerun with the same seed adds nothing, and resolver statistics are
+    # rebuilt once at the end instead of being maintained row by row.
+    rng = random.Random(seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    resolver_ids, weights = generate_resolvers(resolvers, rng)
+
+    inserted = 0
+    for start in range(0, tickets, GENERATE_CHUNK_SIZE):
+        rows = [
+            generate_ticket(index, rng, now, days, resolver_ids, weights, seed)
+            for index in range(start, min(start + GENERATE_CHUNK_SIZE, tickets))
+        ]
+        result = db.session.execute(insert_ignoring_conflicts(Misconfiguration.__table__), rows)
+        inserted += result.rowcount
+        db.session.commit()
+        if progress:
+            progress(start + len(rows))
+
+    rebuild_resolver_stats()
+    db.session.commit()
+    invalidate_sla_deadline()
+    return {"tickets": inserted, "resolvers": len(resolver_ids)}
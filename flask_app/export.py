@@ -0,0 +1,78 @@
+import csv
+import io
+import json
+
+from models import Resolver, Misconfiguration
+
+
+EXPORT_FORMATS = {
+    "csv": "text/csv; charset=utf-8",
+    "ndjson": "application/x-ndjson",
+}
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FIELDS = [
+    "ticket_id",
+    "severity",
+    "provider",
+    "resource",
+    "description",
+    "status",
+    "resolver",
+    "resolver_email",
+    "detected_at",
+    "sla_deadline",
+    "resolved_at",
+    "crowdstrike_id",
+]
+RESOLVER_COLUMNS = {"resolver": Resolver.name, "resolver_email": Resolver.email}
+
+
+def export_rows(query, filters, model=Misconfiguration):
+    # Plain column tuples instead of entities: nothing accumulates in the
+    # identity map, and yield_per keeps a bounded number of rows in flight.
+    if filters["resolver"] in ("", "unassigned"):
+        query = query.outerjoin(model.resolver)
+    columns = [
+        RESOLVER_COLUMNS[name] if name in RESOLVER_COLUMNS else getattr(model, name) for name in EXPORT_FIELDS
+    ]
+    query = (
+        query.with_entities(*columns)
+        .order_by(model.detected_at.desc(), model.id.desc())
+        .execution_options(yield_per=EXPORT_BATCH_SIZE)
+    )
+    for row in query:
+        yield {
+            name: value.isoformat() if hasattr(value, "isoformat") else value
+            for name, value in zip(EXPORT_FIELDS, row)
+        }
+
+
+def _csv_line(writer, buffer, values):
+    writer.writerow(values)
+    line = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return line
+
+
+def iter_export(rows, export_format):
+    buffer = io.StringIO()
+    if export_format == "csv":
+        writer = csv.writer(buffer)
+        yield _csv_line(writer, buffer, EXPORT_FIELDS)
+
+    # The first row goes out on its own so the response starts immediately.
+    chunk = []
+    first = True
+    for row in rows:
+        if export_format == "csv":
+            chunk.append(_csv_line(writer, buffer, [row[name] for name in EXPORT_FIELDS]))
+        else:
+            chunk.append(json.dumps(row, ensure_ascii=False) + "\n")
+        if first or len(chunk) >= EXPORT_BATCH_SIZE:
+            yield "".join(chunk)
+            chunk = []
+            first = False
+    if chunk:
+        yield "".join(chunk)
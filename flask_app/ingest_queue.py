@@ -0,0 +1,147 @@
+import atexit
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from instrumentation import increment, register_gauge
+from models import db
+from utils import import_crowdstrike_detections
+
+
+QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+BATCH_SIZE = int(os.getenv("WEBHOOK_BATCH_SIZE", "500"))
+BATCH_SECONDS = float(os.getenv("WEBHOOK_BATCH_SECONDS", "1.0"))
+IDEMPOTENCY_CACHE_SIZE = int(os.getenv("WEBHOOK_IDEMPOTENCY_CACHE_SIZE", "10000"))
+RETRY_AFTER_SECONDS = 5
+
+_queue = queue.Queue(maxsize=QUEUE_SIZE)
+_seen = OrderedDict()
+_seen_lock = threading.Lock()
+_consumer = {"thread": None}
+_consumer_lock = threading.Lock()
+
+register_gauge("webhook_queue_depth", _queue.qsize)
+
+
+def idempotency_key(headers, body):
+    key = headers.get("Idempotency-Key") or headers.get("X-Idempotency-Key")
+    if key:
+        return f"header:{key}"
+    return f"sha256:{hashlib.sha256(body).hexdigest()}"
+
+
+def _remember(key):
+    with _seen_lock:
+        if key in _seen:
+            _seen.move_to_end(key)
+            return False
+        _seen[key] = True
+        while len(_seen) > IDEMPOTENCY_CACHE_SIZE:
+            _seen.popitem(last=False)
+        return True
+
+
+def _forget(keys):
+    with _seen_lock:
+        for key in keys:
+            _seen.pop(key, None)
+
+
+def enqueue_detections(app, key, detections):
+    if not _remember(key):
+        return "duplicate"
+    _ensure_consumer(app)
+    try:
+        _queue.put_nowait((key, detections))
+    except queue.Full:
+        _forget([key])
+        return "full"
+    return "queued"
+
+
+def _next_batch():
+    payloads = [_queue.get()]
+    size = len(payloads[0][1])
+    deadline = time.monotonic() + BATCH_SECONDS
+    while size < BATCH_SIZE:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        try:
+            payload = _queue.get(timeout=remaining)
+        except queue.Empty:
+            break
+        payloads.append(payload)
+        size += len(payload[1])
+    return payloads
+
+
+def _park(app, key, detections, error):
+    # Every payload here was already answered with 202, so CrowdStrike will
+    # not send it again: keep it on disk for inspection and replay.
+    directory = os.path.join(app.instance_path, "webhook_failed")
+    os.makedirs(directory, exist_ok=True)
+    digest = hashlib.sha256(key.encode("utf-8")).hexdigest()[:16]
+    path = os.path.join(directory, f"{datetime.utcnow():%Y%m%d-%H%M%S-%f}-{digest}.json")
+    with open(path, "w", encoding="utf-8") as parked_file:
+        json.dump({"idempotency_key": key, "error": error, "detections": detections}, parked_file)
+    return path
+
+
+def _import_separately(app, payloads):
+    # A failed merged batch is retried one payload at a time, so one bad
+    # delivery cannot take the valid ones down with it.
+    for key, detections in payloads:
+        try:
+            import_crowdstrike_detections(detections)
+        except Exception as exc:
+            db.session.rollback()
+            _forget([key])
+            path = _park(app, key, detections, repr(exc))
+            increment("webhook_payloads_parked_total")
+            app.logger.exception("Falha ao importar payload do webhook; salvo em %s", path)
+
+
+def _consume(app):
+    while True:
+        payloads = _next_batch()
+        with app.app_context():
+            try:
+                import_crowdstrike_detections([det for _, detections in payloads for det in detections])
+                increment("webhook_batches_total", result="imported")
+            except Exception:
+                increment("webhook_batches_total", result="failed")
+                db.session.rollback()
+                app.logger.exception("Falha ao importar lote do webhook; importando payloads separadamente")
+                _import_separately(app, payloads)
+            finally:
+                db.session.remove()
+                for _ in payloads:
+                    _queue.task_done()
+
+
+def _ensure_consumer(app):
+    with _consumer_lock:
+        if _consumer["thread"] is None:
+            thread = threading.Thread(target=_consume, args=(app,), name="webhook-ingest", daemon=True)
+            thread.start()
+            _consumer["thread"] = thread
+
+
+def wait_for_ingest_queue(timeout=None):
+    if _consumer["thread"] is None:
+        return True
+    deadline = None if timeout is None else time.monotonic() + timeout
+    while _queue.unfinished_tasks:
+        if deadline is not None and time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+atexit.register(wait_for_ingest_queue, 10)
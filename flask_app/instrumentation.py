@@ -0,0 +1,189 @@
+import cProfile
+import os
+import threading
+import time
+from datetime import datetime
+
+from flask import g, has_request_context, request, request_finished, request_started, request_tearing_down
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Mapper
+
+
+# In-process metrics in the Prometheus text format. Each worker process keeps
+# its own registry, so a scraper should target every worker (or sum them).
+
+# Requests slower than this are written to instance/profiles as cProfile
+# dumps. Profiling every request has a real cost, so it is off by default.
+PROFILE_SLOW_REQUEST_MS = float(os.getenv("PROFILE_SLOW_REQUEST_MS", "0"))
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 5000)
+
+METRICS = {
+    "http_requests_total": ("counter", "Requisições HTTP por endpoint, método e status."),
+    "http_request_duration_seconds": ("histogram", "Latência das requisições por endpoint."),
+    "http_request_queries": ("histogram", "Consultas SQL por requisição."),
+    "http_request_rows_hydrated": ("histogram", "Objetos ORM carregados por requisição."),
+    "sql_queries_total": ("counter", "Consultas SQL executadas pelo processo."),
+    "orm_rows_hydrated_total": ("counter", "Objetos ORM carregados, por tabela."),
+    "crowdstrike_requests_total": ("counter", "Requisições HTTP à API do CrowdStrike, por status."),
+    "crowdstrike_detections_total": ("counter", "Detecções processadas na importação, por resultado."),
+    "webhook_batches_total": ("counter", "Lotes do webhook importados, por resultado."),
+    "webhook_queue_depth": ("gauge", "Payloads do webhook aguardando importação."),
+    "webhook_payloads_parked_total": ("counter", "Payloads do webhook que falharam e foram salvos em disco."),
+    "slow_request_profiles_total": ("counter", "Perfis de requisições lentas gravados."),
+}
+
+_lock = threading.Lock()
+# cProfile is process-wide on Python 3.12+ and a second enable() raises, so
+# only one request at a time is profiled; the others run unprofiled.
+_profile_lock = threading.Lock()
+_counters = {}
+_histograms = {}
+_gauges = {}
+
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+
+def increment(name, amount=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+
+def observe(name, value, buckets, **labels):
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {
+                "buckets": buckets,
+                "counts": [0] * len(buckets),
+                "sum": 0.0,
+                "count": 0,
+            }
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                histogram["counts"][i] += 1
+        histogram["sum"] += value
+        histogram["count"] += 1
+
+
+def register_gauge(name, func):
+    _gauges[name] = func
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels, extra=None):
+    pairs = list(labels) + (list(extra) if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def render_metrics():
+    with _lock:
+        counters = dict(_counters)
+        histograms = {key: dict(value, counts=list(value["counts"])) for key, value in _histograms.items()}
+    gauges = {name: func() for name, func in _gauges.items()}
+
+    lines = []
+    for name, (kind, text) in METRICS.items():
+        lines.append(f"# HELP {name} {text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == "counter":
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        elif kind == "gauge":
+            if name in gauges:
+                lines.append(f"{name} {gauges[name]}")
+        else:
+            for (metric, labels), histogram in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(histogram["buckets"], histogram["counts"]):
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {histogram['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_query(conn, cursor, statement, parameters, context, executemany):
+    increment("sql_queries_total")
+    if has_request_context() and "request_started_at" in g:
+        g.query_count += 1
+
+
+@event.listens_for(Mapper, "load")
+def _count_hydrated(target, context):
+    increment("orm_rows_hydrated_total", table=target.__table__.name)
+    if has_request_context() and "request_started_at" in g:
+        g.rows_hydrated += 1
+
+
+def _on_request_started(sender, **extra):
+    g.request_started_at = time.perf_counter()
+    g.query_count = 0
+    g.rows_hydrated = 0
+    if PROFILE_SLOW_REQUEST_MS > 0 and _profile_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # Another profiling tool (a debugger, coverage) is active.
+            _profile_lock.release()
+        else:
+            g.profiler = profiler
+
+
+def _stop_profiler():
+    profiler = g.pop("profiler", None)
+    if profiler is not None:
+        profiler.disable()
+        _profile_lock.release()
+    return profiler
+
+
+def _dump_profile(app, profiler, endpoint, elapsed):
+    directory = os.path.join(app.instance_path, "profiles")
+    os.makedirs(directory, exist_ok=True)
+    filename = f"{datetime.utcnow():%Y%m%d-%H%M%S-%f}-{endpoint}-{int(elapsed * 1000)}ms.prof"
+    profiler.dump_stats(os.path.join(directory, filename))
+    increment("slow_request_profiles_total", endpoint=endpoint)
+
+
+def _on_request_finished(sender, response, **extra):
+    started_at = g.pop("request_started_at", None)
+    if started_at is None:
+        return
+    elapsed = time.perf_counter() - started_at
+    endpoint = request.endpoint or "unmatched"
+
+    increment("http_requests_total", endpoint=endpoint, method=request.method, status=response.status_code)
+    observe("http_request_duration_seconds", elapsed, LATENCY_BUCKETS, endpoint=endpoint)
+    observe("http_request_queries", g.query_count, COUNT_BUCKETS, endpoint=endpoint)
+    observe("http_request_rows_hydrated", g.rows_hydrated, COUNT_BUCKETS, endpoint=endpoint)
+
+    profiler = _stop_profiler()
+    if profiler is not None and elapsed * 1000 >= PROFILE_SLOW_REQUEST_MS:
+        _dump_profile(sender, profiler, endpoint, elapsed)
+
+
+def _on_request_tearing_down(sender, **extra):
+    # request_finished is skipped when an exception propagates.
+    _stop_profiler()
+
+
+def init_instrumentation(app):
+    request_started.connect(_on_request_started, app)
+    request_finished.connect(_on_request_finished, app)
+    request_tearing_down.connect(_on_request_tearing_down, app)
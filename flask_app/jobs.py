@@ -0,0 +1,219 @@
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import or_
+
+from archive import archive_resolved_tickets
+from crowdstrike import sync_crowdstrike
+from models import db, Job
+from rollups import ensure_daily_rollups
+
+
+ACTIVE_STATUSES = ("queued", "running")
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "1"))
+
+# Each process refreshes heartbeat_at on the jobs it owns. Any process may
+# fail an active job whose heartbeat stopped, since its owner is gone.
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+JOB_STALE_SECONDS = JOB_HEARTBEAT_SECONDS * 3
+
+_executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="jobs")
+_handlers = {}
+_schedules = set()
+_schedules_lock = threading.Lock()
+_heartbeat = {"pid": None}
+
+
+def job_owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _stale_before():
+    return datetime.utcnow() - timedelta(seconds=JOB_STALE_SECONDS)
+
+
+def job_handler(kind):
+    def register(func):
+        _handlers[kind] = func
+        return func
+
+    return register
+
+
+def job_to_dict(job):
+    return {
+        "id": job.id,
+        "kind": job.kind,
+        "status": job.status,
+        "progress": job.progress,
+        "params": json.loads(job.params) if job.params else {},
+        "result": json.loads(job.result) if job.result else None,
+        "error": job.error,
+        "created_at": job.created_at.isoformat(),
+        "started_at": job.started_at.isoformat() if job.started_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+
+def submit_job(kind, **params):
+    if kind not in _handlers:
+        raise ValueError(f"Tipo de job desconhecido: {kind}")
+    job = Job(
+        kind=kind,
+        status="queued",
+        params=json.dumps(params),
+        owner=job_owner(),
+        heartbeat_at=datetime.utcnow(),
+    )
+    db.session.add(job)
+    db.session.commit()
+    _executor.submit(_run_job, current_app._get_current_object(), job.id)
+    return job
+
+
+def active_job(kind):
+    return (
+        Job.query.filter(
+            Job.kind == kind,
+            Job.status.in_(ACTIVE_STATUSES),
+            Job.heartbeat_at >= _stale_before(),
+        )
+        .order_by(Job.created_at.desc())
+        .first()
+    )
+
+
+def recent_jobs(limit=5):
+    return Job.query.order_by(Job.created_at.desc()).limit(limit).all()
+
+
+def fail_interrupted_jobs():
+    # Only jobs whose owner stopped sending heartbeats: jobs still running in
+    # other worker processes are left alone.
+    stale = or_(Job.heartbeat_at.is_(None), Job.heartbeat_at < _stale_before())
+    interrupted = Job.query.filter(Job.status.in_(ACTIVE_STATUSES), stale).update(
+        {
+            Job.status: "failed",
+            Job.error: "Interrompido pelo reinício do servidor.",
+            Job.finished_at: datetime.utcnow(),
+        },
+        synchronize_session=False,
+    )
+    db.session.commit()
+    return interrupted
+
+
+def _run_job(app, job_id):
+    with app.app_context():
+        job = db.session.get(Job, job_id)
+        if job is None:
+            return
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        job.heartbeat_at = job.started_at
+        db.session.commit()
+
+        try:
+            result = _handlers[job.kind](job, **json.loads(job.params or "{}"))
+        except Exception as exc:
+            db.session.rollback()
+            job = db.session.get(Job, job_id)
+            job.status = "failed"
+            job.error = str(exc)
+            app.logger.exception("Job %s (%s) falhou", job_id, job.kind)
+        else:
+            job.status = "succeeded"
+            job.result = json.dumps(result)
+        job.finished_at = datetime.utcnow()
+        db.session.commit()
+        db.session.remove()
+
+
+def report_progress(job, progress, result=None):
+    job.progress = progress
+    job.heartbeat_at = datetime.utcnow()
+    if result is not None:
+        job.result = json.dumps(result)
+    db.session.commit()
+
+
+def _beat():
+    Job.query.filter(Job.owner == job_owner(), Job.status.in_(ACTIVE_STATUSES)).update(
+        {Job.heartbeat_at: datetime.utcnow()}, synchronize_session=False
+    )
+    db.session.commit()
+    fail_interrupted_jobs()
+
+
+def start_job_heartbeat(app):
+    # Once per process; the pid check covers workers forked after create_app().
+    with _schedules_lock:
+        if _heartbeat["pid"] == os.getpid():
+            return
+        _heartbeat["pid"] = os.getpid()
+
+    def loop():
+        while True:
+            time.sleep(JOB_HEARTBEAT_SECONDS)
+            with app.app_context():
+                try:
+                    _beat()
+                except Exception:
+                    app.logger.exception("Falha ao atualizar heartbeat dos jobs")
+                finally:
+                    db.session.remove()
+
+    threading.Thread(target=loop, name="jobs-heartbeat", daemon=True).start()
+
+
+def start_scheduler(app, kind, interval_seconds, **params):
+    if interval_seconds <= 0:
+        return
+    with _schedules_lock:
+        if kind in _schedules:
+            return
+        _schedules.add(kind)
+
+    def loop():
+        while True:
+            time.sleep(interval_seconds)
+            with app.app_context():
+                try:
+                    # Every worker process runs this loop; skipping while a job
+                    # of the same kind is active keeps them from piling up.
+                    if not active_job(kind):
+                        submit_job(kind, **params)
+                except Exception:
+                    app.logger.exception("Falha ao agendar job %s", kind)
+                finally:
+                    db.session.remove()
+
+    threading.Thread(target=loop, name=f"scheduler-{kind}", daemon=True).start()
+
+
+@job_handler("crowdstrike_sync")
+def _crowdstrike_sync_job(job, limit=None, filter_query=None, full=False):
+    def progress(counts):
+        report_progress(job, sum(counts.values()), counts)
+
+    return sync_crowdstrike(limit=limit, filter_query=filter_query, full=full, progress=progress)
+
+
+@job_handler("daily_rollup")
+def _daily_rollup_job(job):
+    return {"days": ensure_daily_rollups()}
+
+
+@job_handler("archive_tickets")
+def _archive_tickets_job(job, older_than_days=None):
+    def progress(archived):
+        report_progress(job, archived)
+
+    return {"archived": archive_resolved_tickets(older_than_days, progress=progress)}
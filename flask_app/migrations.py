@@ -0,0 +1,137 @@
+from datetime import datetime
+
+from sqlalchemy import inspect, text
+
+from models import db, ArchivedMisconfiguration, SchemaMigration
+
+
+# Versioned, forward-only schema changes for databases created before the
+# current models. db.create_all() builds new databases with the final schema,
+# so every step must also be a no-op when its change is already present.
+MIGRATIONS = []
+
+
+def migration(version, description):
+    def register(func):
+        MIGRATIONS.append((version, description, func))
+        return func
+
+    return register
+
+
+def _columns(connection, table):
+    return {column["name"] for column in inspect(connection).get_columns(table)}
+
+
+def _create_indexes(connection, indexes):
+    for name, table, columns, unique in indexes:
+        kind = "UNIQUE INDEX" if unique else "INDEX"
+        connection.execute(text(f"CREATE {kind} IF NOT EXISTS {name} ON {table} ({columns})"))
+
+
+@migration(1, "misconfigurations.resolved_at")
+def add_resolved_at(connection):
+    if "resolved_at" in _columns(connection, "misconfigurations"):
+        return
+    connection.execute(text("ALTER TABLE misconfigurations ADD COLUMN resolved_at TIMESTAMP"))
+    connection.execute(
+        text("UPDATE misconfigurations SET resolved_at = :now WHERE status = 'Resolved'"),
+        {"now": datetime.utcnow()},
+    )
+
+
+@migration(2, "indexes for ticket list, SLA sweep and metrics access paths")
+def add_ticket_indexes(connection):
+    _create_indexes(
+        connection,
+        [
+            ("ix_misconfigurations_status_sla_deadline", "misconfigurations", "status, sla_deadline", False),
+            ("ix_misconfigurations_detected_at_id", "misconfigurations", "detected_at, id", False),
+            ("ix_misconfigurations_status_detected_at", "misconfigurations", "status, detected_at", False),
+            ("ix_misconfigurations_severity_status", "misconfigurations", "severity, status", False),
+            ("ix_misconfigurations_provider_detected_at", "misconfigurations", "provider, detected_at", False),
+            ("ix_misconfigurations_resolver_status", "misconfigurations", "resolver_id, status", False),
+            ("ix_jobs_kind_status", "jobs", "kind, status", False),
+        ],
+    )
+
+
+@migration(3, "unique misconfigurations.crowdstrike_id")
+def add_unique_crowdstrike_id(connection):
+    # Older databases may hold the same detection twice. Keep the oldest row
+    # as is and tag the later copies with their id instead of deleting them.
+    connection.execute(
+        text(
+            """
+            UPDATE misconfigurations
+            SET crowdstrike_id = crowdstrike_id || '#' || CAST(id AS VARCHAR(20))
+            WHERE id NOT IN (SELECT MIN(id) FROM misconfigurations GROUP BY crowdstrike_id)
+            """
+        )
+    )
+    _create_indexes(
+        connection,
+        [("ux_misconfigurations_crowdstrike_id", "misconfigurations", "crowdstrike_id", True)],
+    )
+
+
+@migration(4, "jobs.owner and jobs.heartbeat_at")
+def add_job_owner(connection):
+    columns = _columns(connection, "jobs")
+    if "owner" not in columns:
+        connection.execute(text("ALTER TABLE jobs ADD COLUMN owner VARCHAR(255)"))
+    if "heartbeat_at" not in columns:
+        connection.execute(text("ALTER TABLE jobs ADD COLUMN heartbeat_at TIMESTAMP"))
+
+
+@migration(5, "archived_misconfigurations own id and source_id")
+def add_archive_source_id(connection):
+    # The archive used to reuse the working table's id as its primary key,
+    # which collides once SQLite hands a deleted id to a new ticket. The table
+    # is rebuilt with its own key; existing rows keep their id as source_id.
+    if "source_id" in _columns(connection, "archived_misconfigurations"):
+        return
+    columns = ", ".join(
+        column.name
+        for column in ArchivedMisconfiguration.__table__.columns
+        if column.name not in ("id", "source_id")
+    )
+    connection.execute(text("ALTER TABLE archived_misconfigurations RENAME TO archived_misconfigurations_old"))
+    for index in inspect(connection).get_indexes("archived_misconfigurations_old"):
+        connection.execute(text(f"DROP INDEX IF EXISTS {index['name']}"))
+    ArchivedMisconfiguration.__table__.create(connection)
+    connection.execute(
+        text(
+            f"""
+            INSERT INTO archived_misconfigurations (source_id, {columns})
+            SELECT id, {columns} FROM archived_misconfigurations_old ORDER BY id
+            """
+        )
+    )
+    connection.execute(text("DROP TABLE archived_misconfigurations_old"))
+
+
+@migration(6, "drop sync_state.cursor")
+def drop_sync_cursor(connection):
+    # Syncs resume from last_created_timestamp; the paging cursor was never read.
+    if "cursor" in _columns(connection, "sync_state"):
+        connection.execute(text("ALTER TABLE sync_state DROP COLUMN cursor"))
+
+
+def run_migrations():
+    applied = {version for (version,) in db.session.query(SchemaMigration.version)}
+    db.session.commit()
+
+    ran = []
+    for version, description, func in sorted(MIGRATIONS, key=lambda item: item[0]):
+        if version in applied:
+            continue
+        with db.engine.begin() as connection:
+            func(connection)
+            connection.execute(
+                SchemaMigration.__table__.insert().values(
+                    version=version, description=description, applied_at=datetime.utcnow()
+                )
+            )
+        ran.append((version, description))
+    return ran
@@ -35,10 +35,25 @@ class Resolver(db.Model):
     email = db.Column(db.String(160), unique=True, nullable=False)
 
     tickets = db.relationship("Misconfiguration", back_populates="resolver", lazy=True)
+    stats = db.relationship(
+        "ResolverStats",
+        back_populates="resolver",
+        uselist=False,
+        cascade="all, delete-orphan",
+    )
 
 
 class Misconfiguration(db.Model):
     __tablename__ = "misconfigurations"
+    __table_args__ = (
+        db.Index("ix_misconfigurations_status_sla_deadline", "status", "sla_deadline"),
+        db.Index("ix_misconfigurations_detected_at_id", "detected_at", "id"),
+        db.Index("ix_misconfigurations_status_detected_at", "status", "detected_at"),
+        db.Index("ix_misconfigurations_severity_status", "severity", "status"),
+        db.Index("ix_misconfigurations_provider_detected_at", "provider", "detected_at"),
+        db.Index("ix_misconfigurations_resolver_status", "resolver_id", "status"),
+        db.Index("ux_misconfigurations_crowdstrike_id", "crowdstrike_id", unique=True),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     ticket_id = db.Column(db.String(40), unique=True, nullable=False)
@@ -51,5 +66,119 @@ class Misconfiguration(db.Model):
     sla_deadline = db.Column(db.DateTime, nullable=False)
     detected_at = db.Column(db.DateTime, nullable=False)
     crowdstrike_id = db.Column(db.String(40), nullable=False)
+    resolved_at = db.Column(db.DateTime, nullable=True)
 
     resolver = db.relationship("Resolver", back_populates="tickets")
+
+
+class StatsCounters:
+    # Counters kept per resolver, plus one bucket for unassigned tickets, so
+    # the ranking and its global totals never aggregate the tickets tables.
+    total_assigned = db.Column(db.Integer, default=0, nullable=False)
+    resolved_count = db.Column(db.Integer, default=0, nullable=False)
+    resolved_within_sla = db.Column(db.Integer, default=0, nullable=False)
+    resolved_outside_sla = db.Column(db.Integer, default=0, nullable=False)
+    in_progress_count = db.Column(db.Integer, default=0, nullable=False)
+    overdue_count = db.Column(db.Integer, default=0, nullable=False)
+    resolution_hours_total = db.Column(db.Float, default=0, nullable=False)
+    critical_count = db.Column(db.Integer, default=0, nullable=False)
+    high_count = db.Column(db.Integer, default=0, nullable=False)
+    medium_count = db.Column(db.Integer, default=0, nullable=False)
+    low_count = db.Column(db.Integer, default=0, nullable=False)
+    informal_count = db.Column(db.Integer, default=0, nullable=False)
+
+
+class ResolverStats(StatsCounters, db.Model):
+    __tablename__ = "resolver_stats"
+
+    resolver_id = db.Column(db.Integer, db.ForeignKey("resolvers.id"), primary_key=True)
+
+    resolver = db.relationship("Resolver", back_populates="stats")
+
+
+class UnassignedStats(StatsCounters, db.Model):
+    __tablename__ = "unassigned_stats"
+
+    id = db.Column(db.Integer, primary_key=True, default=1)
+
+
+class SyncState(db.Model):
+    __tablename__ = "sync_state"
+
+    name = db.Column(db.String(255), primary_key=True)
+    last_created_timestamp = db.Column(db.String(40), nullable=True)
+    last_synced_at = db.Column(db.DateTime, nullable=True)
+
+
+class Job(db.Model):
+    __tablename__ = "jobs"
+    __table_args__ = (db.Index("ix_jobs_kind_status", "kind", "status"),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(40), nullable=False)
+    status = db.Column(db.String(20), default="queued", nullable=False)
+    params = db.Column(db.Text, nullable=True)
+    progress = db.Column(db.Integer, default=0, nullable=False)
+    result = db.Column(db.Text, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    owner = db.Column(db.String(255), nullable=True)
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+
+
+class SchemaMigration(db.Model):
+    __tablename__ = "schema_migrations"
+
+    version = db.Column(db.Integer, primary_key=True)
+    description = db.Column(db.String(255), nullable=False)
+    applied_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class TableVersion(db.Model):
+    __tablename__ = "table_versions"
+
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.Integer, default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+
+class DailyRollup(db.Model):
+    __tablename__ = "daily_rollups"
+
+    day = db.Column(db.Date, primary_key=True)
+    severity = db.Column(db.String(20), primary_key=True)
+    provider = db.Column(db.String(20), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    ticket_count = db.Column(db.Integer, default=0, nullable=False)
+    within_sla_count = db.Column(db.Integer, default=0, nullable=False)
+
+
+class ArchivedMisconfiguration(db.Model):
+    __tablename__ = "archived_misconfigurations"
+    __table_args__ = (
+        db.Index("ix_archived_misconfigurations_detected_at_id", "detected_at", "id"),
+        db.Index("ix_archived_misconfigurations_resolver_id", "resolver_id"),
+        db.Index("ix_archived_misconfigurations_source_id", "source_id"),
+        db.Index("ux_archived_misconfigurations_crowdstrike_id", "crowdstrike_id", unique=True),
+    )
+
+    # The working table may hand a deleted id to a new ticket, so the archive
+    # keeps its own key and records the original one as source_id.
+    id = db.Column(db.Integer, primary_key=True)
+    source_id = db.Column(db.Integer, nullable=False)
+    ticket_id = db.Column(db.String(40), unique=True, nullable=False)
+    severity = db.Column(db.String(20), nullable=False)
+    provider = db.Column(db.String(20), nullable=False)
+    resource = db.Column(db.String(255), nullable=False)
+    description = db.Column(db.String(500), nullable=False)
+    resolver_id = db.Column(db.Integer, db.ForeignKey("resolvers.id"), nullable=True)
+    status = db.Column(db.String(20), nullable=False)
+    sla_deadline = db.Column(db.DateTime, nullable=False)
+    detected_at = db.Column(db.DateTime, nullable=False)
+    crowdstrike_id = db.Column(db.String(40), nullable=False)
+    resolved_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    resolver = db.relationship("Resolver")
@@ -0,0 +1,124 @@
+from datetime import datetime
+
+from sqlalchemy import func, or_, tuple_
+from sqlalchemy.orm import contains_eager, joinedload, load_only
+
+from models import Resolver, Misconfiguration
+from search import search_filter
+
+
+def ticket_filters_from_args(args):
+    return {
+        "search": args.get("search", "").strip().lower(),
+        "severity": args.getlist("severity"),
+        "provider": args.getlist("provider"),
+        "status": args.getlist("status"),
+        "resolver": args.get("resolver", "").strip().lower(),
+    }
+
+
+def filtered_tickets_query(filters, model=Misconfiguration):
+    query = model.query
+    if filters["severity"]:
+        query = query.filter(model.severity.in_(filters["severity"]))
+    if filters["provider"]:
+        query = query.filter(model.provider.in_(filters["provider"]))
+    if filters["status"]:
+        query = query.filter(model.status.in_(filters["status"]))
+    if filters["search"]:
+        query = query.filter(search_filter(filters["search"], model))
+
+    resolver_query = filters["resolver"]
+    if resolver_query == "unassigned":
+        query = query.filter(model.resolver_id.is_(None))
+    elif resolver_query:
+        query = (
+            query.join(model.resolver)
+            .filter(
+                or_(
+                    func.lower(Resolver.name).contains(resolver_query, autoescape=True),
+                    func.lower(Resolver.email).contains(resolver_query, autoescape=True),
+                )
+            )
+            .options(contains_eager(model.resolver))
+        )
+    return query
+
+
+# Columns rendered by partials/tickets_table.html, full and compact. The
+# cursor needs detected_at, so it is always loaded.
+TABLE_COLUMNS = ("ticket_id", "severity", "provider", "resource", "description", "status", "sla_deadline")
+COMPACT_TABLE_COLUMNS = ("ticket_id", "severity", "resource", "description", "status")
+
+
+def list_load_options(columns, resolver=False):
+    # List views load only what they render. The resolver is a many-to-one,
+    # so joining it costs no extra query and nothing is lazy-loaded per row.
+    names = {"detected_at", *columns}
+    options = []
+    if resolver:
+        names.add("resolver_id")
+        options.append(joinedload(Misconfiguration.resolver))
+    options.append(load_only(*(getattr(Misconfiguration, name) for name in sorted(names))))
+    return options
+
+
+PAGE_SIZES = (25, 50, 100, 200)
+DEFAULT_PAGE_SIZE = 50
+
+
+def parse_page_size(value):
+    try:
+        page_size = int(value)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return page_size if page_size in PAGE_SIZES else DEFAULT_PAGE_SIZE
+
+
+def encode_cursor(ticket):
+    return f"{ticket.detected_at.isoformat()}_{ticket.id}"
+
+
+def decode_cursor(value):
+    if not value:
+        return None
+    detected_at, _, ticket_id = value.rpartition("_")
+    try:
+        return datetime.fromisoformat(detected_at), int(ticket_id)
+    except ValueError:
+        return None
+
+
+def paginate_tickets(query, page_size, after=None, before=None):
+    key = tuple_(Misconfiguration.detected_at, Misconfiguration.id)
+    after = decode_cursor(after)
+    before = decode_cursor(before) if not after else None
+
+    if before:
+        rows = (
+            query.filter(key > before)
+            .order_by(Misconfiguration.detected_at.asc(), Misconfiguration.id.asc())
+            .limit(page_size + 1)
+            .all()
+        )
+        has_previous = len(rows) > page_size
+        items = list(reversed(rows[:page_size]))
+        has_next = True
+    else:
+        if after:
+            query = query.filter(key < after)
+        rows = (
+            query.order_by(Misconfiguration.detected_at.desc(), Misconfiguration.id.desc())
+            .limit(page_size + 1)
+            .all()
+        )
+        items = rows[:page_size]
+        has_next = len(rows) > page_size
+        has_previous = after is not None
+
+    return {
+        "items": items,
+        "page_size": page_size,
+        "next_cursor": encode_cursor(items[-1]) if items and has_next else None,
+        "previous_cursor": encode_cursor(items[0]) if items and has_previous else None,
+    }
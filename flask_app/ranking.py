@@ -0,0 +1,282 @@
+from datetime import datetime
+
+from sqlalchemy import case, event, func, inspect, insert, literal, select, union_all, update
+
+from archive import ticket_history
+from models import db, Resolver, Misconfiguration, ResolverStats, UnassignedStats
+
+
+SEVERITY_COLUMNS = {
+    "CRITICAL": "critical_count",
+    "HIGH": "high_count",
+    "MEDIUM": "medium_count",
+    "LOW": "low_count",
+    "INFORMAL": "informal_count",
+}
+
+TRACKED_COLUMNS = ("resolver_id", "severity", "status", "sla_deadline", "detected_at", "resolved_at")
+HISTORY_COLUMNS = ("id", *TRACKED_COLUMNS)
+
+UNASSIGNED_ID = 1
+
+stats_table = ResolverStats.__table__
+unassigned_table = UnassignedStats.__table__
+tickets_table = Misconfiguration.__table__
+COUNTER_COLUMNS = [column.name for column in unassigned_table.columns if column.name != "id"]
+
+
+def _contribution(ticket):
+    values = {"total_assigned": 1}
+    severity_column = SEVERITY_COLUMNS.get(ticket["severity"])
+    if severity_column:
+        values[severity_column] = 1
+
+    status = ticket["status"]
+    if status == "Resolved":
+        resolved_at = ticket["resolved_at"] or ticket["detected_at"]
+        values["resolved_count"] = 1
+        if resolved_at <= ticket["sla_deadline"]:
+            values["resolved_within_sla"] = 1
+        else:
+            values["resolved_outside_sla"] = 1
+        values["resolution_hours_total"] = (resolved_at - ticket["detected_at"]).total_seconds() / 3600
+    elif status == "In Progress":
+        values["in_progress_count"] = 1
+    elif status == "Overdue":
+        values["overdue_count"] = 1
+    return values
+
+
+def _stats_row(resolver_id):
+    # Unassigned tickets are counted in a single bucket row, so the global
+    # totals are the sum of the resolver rows and that bucket.
+    if resolver_id is None:
+        return unassigned_table, unassigned_table.c.id == UNASSIGNED_ID, {"id": UNASSIGNED_ID}
+    return stats_table, stats_table.c.resolver_id == resolver_id, {"resolver_id": resolver_id}
+
+
+def apply_stats_delta(connection, resolver_id, deltas):
+    deltas = {name: amount for name, amount in deltas.items() if amount}
+    if not deltas:
+        return
+
+    table, key, key_values = _stats_row(resolver_id)
+    result = connection.execute(
+        update(table).where(key).values({name: table.c[name] + amount for name, amount in deltas.items()})
+    )
+    if result.rowcount == 0:
+        row = {name: 0 for name in COUNTER_COLUMNS}
+        row.update(deltas, **key_values)
+        connection.execute(insert(table).values(row))
+
+
+def _apply_contribution(connection, ticket, sign):
+    contribution = _contribution(ticket)
+    apply_stats_delta(
+        connection,
+        ticket["resolver_id"],
+        {name: sign * amount for name, amount in contribution.items()},
+    )
+
+
+def record_inserted_tickets(rows):
+    # For Core inserts, which bypass the mapper events below.
+    deltas = {}
+    for row in rows:
+        resolver_deltas = deltas.setdefault(row["resolver_id"], {})
+        for name, amount in _contribution(row).items():
+            resolver_deltas[name] = resolver_deltas.get(name, 0) + amount
+    connection = db.session.connection()
+    for resolver_id, resolver_deltas in deltas.items():
+        apply_stats_delta(connection, resolver_id, resolver_deltas)
+
+
+def release_resolver_stats(resolver_id):
+    # A deleted resolver's tickets become unassigned: its counters move to
+    # the unassigned bucket instead of being recomputed.
+    row = db.session.execute(
+        select(*(stats_table.c[name] for name in COUNTER_COLUMNS)).where(stats_table.c.resolver_id == resolver_id)
+    ).first()
+    if row is None:
+        return
+    db.session.execute(stats_table.delete().where(stats_table.c.resolver_id == resolver_id))
+    apply_stats_delta(db.session.connection(), None, dict(row._mapping))
+
+
+def record_overdue_transitions(transitions):
+    connection = db.session.connection()
+    for resolver_id, status, total in transitions:
+        deltas = {"overdue_count": total}
+        if status == "In Progress":
+            deltas["in_progress_count"] = -total
+        apply_stats_delta(connection, resolver_id, deltas)
+
+
+def _snapshot(ticket):
+    return {name: getattr(ticket, name) for name in TRACKED_COLUMNS}
+
+
+def _stored_snapshot(connection, ticket_id):
+    row = connection.execute(
+        select(*(tickets_table.c[name] for name in TRACKED_COLUMNS)).where(tickets_table.c.id == ticket_id)
+    ).first()
+    return dict(row._mapping) if row else None
+
+
+def _hours_between(start, end):
+    if db.engine.dialect.name == "sqlite":
+        return (func.julianday(end) - func.julianday(start)) * 24
+    return func.extract("epoch", end - start) / 3600
+
+
+def _aggregate_columns(tickets):
+    resolved = tickets.c.status == "Resolved"
+    resolved_at = func.coalesce(tickets.c.resolved_at, tickets.c.detected_at)
+
+    def count_when(condition):
+        return func.coalesce(func.sum(case((condition, 1), else_=0)), 0)
+
+    columns = {
+        "total_assigned": func.count(tickets.c.id),
+        "resolved_count": count_when(resolved),
+        "resolved_within_sla": count_when(resolved & (resolved_at <= tickets.c.sla_deadline)),
+        "resolved_outside_sla": count_when(resolved & (resolved_at > tickets.c.sla_deadline)),
+        "in_progress_count": count_when(tickets.c.status == "In Progress"),
+        "overdue_count": count_when(tickets.c.status == "Overdue"),
+        "resolution_hours_total": func.coalesce(
+            func.sum(case((resolved, _hours_between(tickets.c.detected_at, resolved_at)), else_=0)),
+            0,
+        ),
+    }
+    for severity, name in SEVERITY_COLUMNS.items():
+        columns[name] = count_when(tickets.c.severity == severity)
+    return columns
+
+
+def rebuild_resolver_stats(resolver_ids=None):
+    # Archived tickets still count towards their resolver's history. None in
+    # resolver_ids (or a full rebuild) also recomputes the unassigned bucket.
+    tickets = ticket_history(*HISTORY_COLUMNS)
+    columns = _aggregate_columns(tickets)
+    rebuild_unassigned = resolver_ids is None
+    aggregate = (
+        select(tickets.c.resolver_id, *columns.values())
+        .where(tickets.c.resolver_id.isnot(None))
+        .group_by(tickets.c.resolver_id)
+    )
+    clear = stats_table.delete()
+    if resolver_ids is not None:
+        rebuild_unassigned = None in resolver_ids
+        resolver_ids = [resolver_id for resolver_id in resolver_ids if resolver_id is not None]
+        aggregate = aggregate.where(tickets.c.resolver_id.in_(resolver_ids))
+        clear = clear.where(stats_table.c.resolver_id.in_(resolver_ids))
+
+    if resolver_ids is None or resolver_ids:
+        db.session.execute(clear)
+        db.session.execute(
+            insert(stats_table).from_select(["resolver_id", *columns.keys()], aggregate)
+        )
+    if rebuild_unassigned:
+        db.session.execute(unassigned_table.delete())
+        db.session.execute(
+            insert(unassigned_table).from_select(
+                ["id", *columns.keys()],
+                select(literal(UNASSIGNED_ID), *columns.values()).where(tickets.c.resolver_id.is_(None)),
+            )
+        )
+
+
+def ranking_entries():
+    rows = (
+        db.session.query(ResolverStats, Resolver)
+        .join(Resolver, Resolver.id == ResolverStats.resolver_id)
+        .filter(ResolverStats.total_assigned > 0)
+        .all()
+    )
+
+    entries = []
+    for stats, resolver in rows:
+        entry = {
+            "resolver": resolver,
+            "resolved_count": stats.resolved_count,
+            "resolved_within_sla": stats.resolved_within_sla,
+            "resolved_outside_sla": stats.resolved_outside_sla,
+            "in_progress_count": stats.in_progress_count,
+            "overdue_count": stats.overdue_count,
+            "total_assigned": stats.total_assigned,
+            "avg_resolution_time": 0,
+            "sla_compliance_rate": 0,
+            "severity_breakdown": {
+                severity: getattr(stats, name) for severity, name in SEVERITY_COLUMNS.items()
+            },
+        }
+        if stats.resolved_count > 0:
+            entry["avg_resolution_time"] = stats.resolution_hours_total / stats.resolved_count
+            entry["sla_compliance_rate"] = round(
+                (stats.resolved_within_sla / stats.resolved_count) * 100
+            )
+        entries.append(entry)
+
+    entries.sort(
+        key=lambda x: (
+            -x["resolved_within_sla"],
+            -x["resolved_count"],
+            -x["sla_compliance_rate"],
+        )
+    )
+    return entries
+
+
+def ranking_totals():
+    names = ("resolved_count", "resolved_within_sla", "in_progress_count", "overdue_count")
+    counters = union_all(
+        select(*(stats_table.c[name] for name in names)),
+        select(*(unassigned_table.c[name] for name in names)),
+    ).subquery()
+    row = db.session.execute(select(*(func.coalesce(func.sum(counters.c[name]), 0) for name in names))).one()
+    total_resolved, resolved_within_sla, total_in_progress, total_overdue = row
+    return {
+        "total_resolved": total_resolved,
+        "total_in_progress": total_in_progress,
+        "total_overdue": total_overdue,
+        "resolved_within_sla": resolved_within_sla,
+        "resolved_outside_sla": total_resolved - resolved_within_sla,
+        "global_sla_compliance": round((resolved_within_sla / total_resolved) * 100) if total_resolved else 0,
+    }
+
+
+@event.listens_for(Misconfiguration, "before_insert")
+def _stamp_resolved_on_insert(mapper, connection, target):
+    if target.status == "Resolved" and target.resolved_at is None:
+        target.resolved_at = datetime.utcnow()
+    elif target.status != "Resolved":
+        target.resolved_at = None
+
+
+@event.listens_for(Misconfiguration, "after_insert")
+def _add_ticket_stats(mapper, connection, target):
+    _apply_contribution(connection, _snapshot(target), 1)
+
+
+@event.listens_for(Misconfiguration, "before_update")
+def _update_ticket_stats(mapper, connection, target):
+    state = inspect(target)
+    if not any(state.attrs[name].history.has_changes() for name in TRACKED_COLUMNS):
+        return
+
+    before = _stored_snapshot(connection, target.id)
+    if target.status != "Resolved":
+        target.resolved_at = None
+    elif before is None or before["status"] != "Resolved":
+        target.resolved_at = target.resolved_at or datetime.utcnow()
+
+    if before:
+        _apply_contribution(connection, before, -1)
+    _apply_contribution(connection, _snapshot(target), 1)
+
+
+@event.listens_for(Misconfiguration, "before_delete")
+def _remove_ticket_stats(mapper, connection, target):
+    before = _stored_snapshot(connection, target.id)
+    if before:
+        _apply_contribution(connection, before, -1)
@@ -0,0 +1,52 @@
+from sqlalchemy import func, literal, select, union_all
+
+from models import db, Misconfiguration, ArchivedMisconfiguration
+from queries import COMPACT_TABLE_COLUMNS, list_load_options
+
+
+def ticket_counts():
+    rows = (
+        db.session.query(
+            Misconfiguration.severity,
+            Misconfiguration.status,
+            func.count(Misconfiguration.id),
+        )
+        .group_by(Misconfiguration.severity, Misconfiguration.status)
+        .all()
+    )
+    return {(severity, status): total for severity, status, total in rows}
+
+
+def dashboard_metrics():
+    # Archived tickets are all resolved and still count as such; their total
+    # rides along in the same statement as the working table's counts.
+    rows = db.session.execute(
+        union_all(
+            select(Misconfiguration.severity, Misconfiguration.status, func.count(Misconfiguration.id)).group_by(
+                Misconfiguration.severity, Misconfiguration.status
+            ),
+            select(literal(None), literal("Resolved"), func.count(ArchivedMisconfiguration.id)),
+        )
+    )
+    metrics = {"critical": 0, "high": 0, "overdue": 0, "resolved": 0}
+    for severity, status, total in rows:
+        if status == "Resolved":
+            metrics["resolved"] += total
+            continue
+        if status == "Overdue":
+            metrics["overdue"] += total
+        if severity == "CRITICAL":
+            metrics["critical"] += total
+        elif severity == "HIGH":
+            metrics["high"] += total
+    return metrics
+
+
+def recent_open_tickets(limit=5):
+    return (
+        Misconfiguration.query.filter(Misconfiguration.status != "Resolved")
+        .options(*list_load_options(COMPACT_TABLE_COLUMNS))
+        .order_by(Misconfiguration.detected_at.desc())
+        .limit(limit)
+        .all()
+    )
@@ -0,0 +1,209 @@
+import os
+from datetime import datetime, time, timedelta
+from threading import Lock
+
+from sqlalchemy import and_, case, func, insert, literal, select
+from sqlalchemy.exc import IntegrityError
+
+from archive import ticket_history
+from models import db, DailyRollup
+
+
+# Days reconstructed when the table is empty. Status history is not stored,
+# so a past day's status is derived from detected_at, resolved_at and
+# sla_deadline as of the end of that day. Backfills run in the daily_rollup
+# job or `flask rollup`; requests roll up at most one missing day inline.
+ROLLUP_BACKFILL_DAYS = int(os.getenv("ROLLUP_BACKFILL_DAYS", "35"))
+TREND_WINDOWS = (7, 30)
+SPARKLINE_DAYS = 30
+
+rollups_table = DailyRollup.__table__
+
+_lock = Lock()
+_state = {"rolled_through": None}
+
+
+def _day_end(day):
+    return datetime.combine(day + timedelta(days=1), time.min)
+
+
+def _rollup_select(day):
+    # Archived tickets are part of the history, so past days keep their counts.
+    day_end = _day_end(day)
+    tickets = ticket_history(
+        "id", "severity", "provider", "status", "sla_deadline", "detected_at", "resolved_at"
+    )
+    resolved_at = func.coalesce(tickets.c.resolved_at, tickets.c.detected_at)
+    resolved = and_(tickets.c.status == "Resolved", resolved_at < day_end)
+    status = case(
+        (resolved, "Resolved"),
+        (tickets.c.sla_deadline < day_end, "Overdue"),
+        (tickets.c.status == "In Progress", "In Progress"),
+        else_="Open",
+    )
+    within_sla = case((and_(resolved, resolved_at <= tickets.c.sla_deadline), 1), else_=0)
+    return (
+        select(
+            literal(day, DailyRollup.day.type),
+            tickets.c.severity,
+            tickets.c.provider,
+            status,
+            func.count(tickets.c.id),
+            func.sum(within_sla),
+        )
+        .where(tickets.c.detected_at < day_end)
+        .group_by(tickets.c.severity, tickets.c.provider, status)
+    )
+
+
+def rollup_day(day):
+    db.session.execute(rollups_table.delete().where(rollups_table.c.day == day))
+    db.session.execute(
+        insert(rollups_table).from_select(
+            ["day", "severity", "provider", "status", "ticket_count", "within_sla_count"],
+            _rollup_select(day),
+        )
+    )
+
+
+def pending_rollup_days(today=None):
+    # Completed days not rolled up yet, oldest first. The in-process marker
+    # makes the common case (yesterday already done) free of queries.
+    today = today or datetime.utcnow().date()
+    yesterday = today - timedelta(days=1)
+    with _lock:
+        if _state["rolled_through"] is not None and _state["rolled_through"] >= yesterday:
+            return []
+
+    last_day = db.session.query(func.max(DailyRollup.day)).scalar()
+    start = today - timedelta(days=ROLLUP_BACKFILL_DAYS)
+    if last_day is not None:
+        start = max(start, last_day + timedelta(days=1))
+    days = [start + timedelta(days=offset) for offset in range((yesterday - start).days + 1)]
+    if not days:
+        with _lock:
+            _state["rolled_through"] = yesterday
+    return days
+
+
+def roll_up_days(days):
+    # One transaction per day: each day is a full scan of the ticket history,
+    # and other writers must get the SQLite write lock in between.
+    rolled = 0
+    for day in days:
+        try:
+            rollup_day(day)
+            db.session.commit()
+        except IntegrityError:
+            # Another worker rolled up the same day concurrently.
+            db.session.rollback()
+            break
+        rolled += 1
+    if days and rolled == len(days):
+        with _lock:
+            if _state["rolled_through"] is None or _state["rolled_through"] < days[-1]:
+                _state["rolled_through"] = days[-1]
+    return rolled
+
+
+def ensure_daily_rollups(today=None):
+    return roll_up_days(pending_rollup_days(today))
+
+
+def _empty_day():
+    return {
+        "critical": 0,
+        "high": 0,
+        "overdue": 0,
+        "resolved": 0,
+        "resolved_within_sla": 0,
+        "by_severity": {},
+    }
+
+
+def daily_series(days=SPARKLINE_DAYS, today=None):
+    # Keyed by ISO date so the series can be stored by any cache backend.
+    today = today or datetime.utcnow().date()
+    start = today - timedelta(days=days)
+    rows = db.session.execute(
+        select(
+            DailyRollup.day,
+            DailyRollup.severity,
+            DailyRollup.status,
+            func.sum(DailyRollup.ticket_count),
+            func.sum(DailyRollup.within_sla_count),
+        )
+        .where(DailyRollup.day >= start)
+        .group_by(DailyRollup.day, DailyRollup.severity, DailyRollup.status)
+    ).all()
+
+    series = {}
+    for day, severity, status, total, within_sla in rows:
+        entry = series.setdefault(day.isoformat(), _empty_day())
+        if status == "Resolved":
+            entry["resolved"] += total
+            entry["resolved_within_sla"] += within_sla
+            severity_entry = entry["by_severity"].setdefault(severity, [0, 0])
+            severity_entry[0] += total
+            severity_entry[1] += within_sla
+            continue
+        if status == "Overdue":
+            entry["overdue"] += total
+        if severity == "CRITICAL":
+            entry["critical"] += total
+        elif severity == "HIGH":
+            entry["high"] += total
+    for entry in series.values():
+        entry["compliance"] = compliance(entry["resolved"], entry["resolved_within_sla"])
+    return series
+
+
+def compliance(resolved, within_sla):
+    return round(within_sla / resolved * 100, 1) if resolved else None
+
+
+def format_delta(current, previous, percent=True, unit=""):
+    if previous is None or current is None:
+        return "—"
+    change = round(current - previous, 1)
+    if not percent:
+        return f"{change:+g}{unit}"
+    if previous == 0:
+        return "—" if current == 0 else "novo"
+    return f"{change / previous * 100:+.0f}%"
+
+
+def trend_for(series, key, current, today=None, percent=True, unit=""):
+    today = today or datetime.utcnow().date()
+    trends = {}
+    for window in TREND_WINDOWS:
+        previous = series.get((today - timedelta(days=window)).isoformat())
+        trends[f"{window}d"] = format_delta(current, previous[key] if previous else None, percent, unit)
+    return trends
+
+
+def sparkline(series, key, current, days=SPARKLINE_DAYS, today=None, width=100, height=24):
+    today = today or datetime.utcnow().date()
+    window = [(today - timedelta(days=offset)).isoformat() for offset in range(days, 0, -1)]
+    values = [series[day][key] for day in window if day in series]
+    values.append(current)
+    if len(values) < 2:
+        return ""
+    low, high = min(values), max(values)
+    span = (high - low) or 1
+    step = width / (len(values) - 1)
+    return " ".join(
+        f"{i * step:.1f},{height - (value - low) / span * height:.1f}" for i, value in enumerate(values)
+    )
+
+
+def sla_compliance_summary(series, severities=("CRITICAL", "HIGH", "MEDIUM")):
+    if not series:
+        return {"overall": None, "by_severity": {severity: None for severity in severities}}
+    latest = series[max(series)]
+    return {
+        "overall": compliance(latest["resolved"], latest["resolved_within_sla"]),
+        "by_severity": {
+            severity: compliance(*latest["by_severity"].get(severity, (0, 0))) for severity in severities
+        },
+    }
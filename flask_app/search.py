@@ -0,0 +1,100 @@
+from sqlalchemy import column, func, or_, text
+from sqlalchemy.exc import OperationalError
+
+from models import db, Misconfiguration
+
+
+FTS_TABLE = "misconfigurations_fts"
+FTS_COLUMNS = ("resource", "description", "crowdstrike_id", "ticket_id")
+
+# The trigram tokenizer indexes every 3-character window, which keeps the
+# substring semantics of the old Python filter. Shorter terms fall back to LIKE.
+MIN_FTS_TERM_LENGTH = 3
+
+_columns = ", ".join(FTS_COLUMNS)
+_new_values = ", ".join(f"new.{name}" for name in FTS_COLUMNS)
+_old_values = ", ".join(f"old.{name}" for name in FTS_COLUMNS)
+
+SEARCH_INDEX_DDL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        {_columns}, content='misconfigurations', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON misconfigurations BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON misconfigurations BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF {_columns} ON misconfigurations BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, {_columns}) VALUES ('delete', old.id, {_old_values});
+        INSERT INTO {FTS_TABLE}(rowid, {_columns}) VALUES (new.id, {_new_values});
+    END
+    """,
+]
+
+_state = {"available": None}
+
+
+def _index_exists(connection):
+    row = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": FTS_TABLE},
+    ).first()
+    return row is not None
+
+
+def ensure_search_index():
+    if db.engine.dialect.name != "sqlite":
+        _state["available"] = False
+        return False
+
+    with db.engine.begin() as connection:
+        created = not _index_exists(connection)
+        try:
+            for statement in SEARCH_INDEX_DDL:
+                connection.execute(text(statement))
+        except OperationalError:
+            # SQLite builds without FTS5 or the trigram tokenizer (< 3.34).
+            _state["available"] = False
+            return False
+        if created:
+            connection.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+    _state["available"] = True
+    return True
+
+
+def search_index_available():
+    if _state["available"] is None:
+        if db.engine.dialect.name != "sqlite":
+            _state["available"] = False
+        else:
+            with db.engine.connect() as connection:
+                _state["available"] = _index_exists(connection)
+    return _state["available"]
+
+
+def search_filter(term, model=Misconfiguration):
+    # The FTS index only covers the working table; archived tickets use LIKE.
+    if model is Misconfiguration and len(term) >= MIN_FTS_TERM_LENGTH and search_index_available():
+        phrase = '"{}"'.format(term.replace('"', '""'))
+        matches = (
+            text(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH :phrase")
+            .bindparams(phrase=phrase)
+            .columns(column("rowid", db.Integer))
+        )
+        return Misconfiguration.id.in_(matches)
+
+    return or_(
+        *(
+            func.lower(getattr(model, name)).contains(term, autoescape=True)
+            for name in FTS_COLUMNS
+        )
+    )
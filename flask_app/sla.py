@@ -0,0 +1,83 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from threading import Lock
+
+from sqlalchemy import event, func, update
+
+from models import db, Misconfiguration
+from ranking import record_overdue_transitions
+
+
+CLOSED_STATUSES = ("Resolved", "Overdue")
+# Matching the open statuses with IN (rather than NOT IN the closed ones)
+# lets SQLite range-scan ix_misconfigurations_status_sla_deadline.
+OPEN_STATUSES = ("Open", "In Progress")
+
+# Deadlines written by other worker processes are not seen by the mapper
+# events below, so the cached deadline is trusted for a bounded time only.
+RECHECK_INTERVAL = timedelta(seconds=60)
+
+_lock = Lock()
+_state = {"next_deadline": None, "checked_at": None}
+
+
+def invalidate(deadline=None):
+    with _lock:
+        if deadline is None or _state["checked_at"] is None:
+            _state["checked_at"] = None
+            return
+        current = _state["next_deadline"]
+        if current is None or deadline < current:
+            _state["next_deadline"] = deadline
+
+
+def _sweep_due(now):
+    checked_at = _state["checked_at"]
+    if checked_at is None or now - checked_at >= RECHECK_INTERVAL:
+        return True
+    next_deadline = _state["next_deadline"]
+    return next_deadline is not None and next_deadline < now
+
+
+def ensure_overdue_status():
+    now = datetime.utcnow()
+    with _lock:
+        if not _sweep_due(now):
+            return 0
+
+    # One UPDATE per source status, counting the resolvers of the rows it
+    # actually changed: a grouped SELECT ahead of the UPDATE could count
+    # tickets that another request or worker changed in between.
+    transitions = []
+    for status in OPEN_STATUSES:
+        resolver_ids = db.session.scalars(
+            update(Misconfiguration)
+            .where(Misconfiguration.status == status, Misconfiguration.sla_deadline < now)
+            .values(status="Overdue")
+            .returning(Misconfiguration.resolver_id),
+            execution_options={"synchronize_session": False},
+        ).all()
+        transitions.extend(
+            (resolver_id, status, total) for resolver_id, total in Counter(resolver_ids).items()
+        )
+    updated = sum(total for _, _, total in transitions)
+    if updated:
+        record_overdue_transitions(transitions)
+    next_deadline = (
+        db.session.query(func.min(Misconfiguration.sla_deadline))
+        .filter(Misconfiguration.status.in_(OPEN_STATUSES))
+        .scalar()
+    )
+    db.session.commit()
+
+    with _lock:
+        _state["next_deadline"] = next_deadline
+        _state["checked_at"] = now
+    return updated
+
+
+@event.listens_for(Misconfiguration, "after_insert")
+@event.listens_for(Misconfiguration, "after_update")
+def _track_deadline(mapper, connection, target):
+    if target.status not in CLOSED_STATUSES and target.sla_deadline is not None:
+        invalidate(target.sla_deadline)
@@ -36,3 +36,58 @@
 
   updateToggle();
 })();
+
+(function () {
+  const jobs = document.querySelectorAll("[data-job-url]");
+  if (!jobs.length) {
+    return;
+  }
+
+  const labels = {
+    queued: "Na fila",
+    running: "Em execução",
+    succeeded: "Concluído",
+    failed: "Falhou",
+  };
+
+  function poll(element) {
+    fetch(element.dataset.jobUrl, { headers: { Accept: "application/json" } })
+      .then(function (response) {
+        return response.json();
+      })
+      .then(function (job) {
+        element.querySelector("[data-job-status]").textContent = labels[job.status] || job.status;
+        element.querySelector("[data-job-progress]").textContent = job.error
+          ? job.error
+          : `${job.progress} detecções processadas`;
+        if (job.status === "queued" || job.status === "running") {
+          setTimeout(function () {
+            poll(element);
+          }, 2000);
+        } else {
+          window.location.reload();
+        }
+      })
+      .catch(function () {
+        setTimeout(function () {
+          poll(element);
+        }, 5000);
+      });
+  }
+
+  jobs.forEach(poll);
+})();
+
+(function () {
+  const selectAll = document.querySelector("[data-bulk-select-all]");
+  if (!selectAll) {
+    return;
+  }
+
+  const items = document.querySelectorAll("[data-bulk-item]");
+  selectAll.addEventListener("change", function () {
+    items.forEach(function (item) {
+      item.checked = selectAll.checked;
+    });
+  });
+})();
@@ -0,0 +1,29 @@
+import os
+import sys
+
+import pytest
+
+# The app modules import each other as top-level modules (see app.py).
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Read at import time by the modules below; tests must not hit real services
+# or share state through the result cache.
+os.environ.setdefault("CACHE_BACKEND", "none")
+os.environ.setdefault("CROWDSTRIKE_SYNC_INTERVAL", "0")
+
+from crowdstrike_stub import start_stub_server  # noqa: E402
+
+
+@pytest.fixture
+def make_stub():
+    servers = []
+
+    def start(**options):
+        server, base_url = start_stub_server(**options)
+        servers.append(server)
+        return server, base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
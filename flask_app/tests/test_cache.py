@@ -0,0 +1,37 @@
+import itertools
+import sqlite3
+
+import cache
+from cache import MemoryCache, SqliteCache
+
+
+def fill_and_touch(backend):
+    backend.set("a", 1)
+    backend.set("b", 2)
+    assert backend.get("a") == 1
+    backend.set("c", 3)
+    return [backend.get(key) for key in ("a", "b", "c")]
+
+
+def test_memory_cache_evicts_least_recently_used():
+    assert fill_and_touch(MemoryCache(2, 60)) == [1, None, 3]
+
+
+def test_sqlite_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    clock = itertools.count(1000)
+    monkeypatch.setattr(cache.time, "time", lambda: next(clock))
+
+    assert fill_and_touch(SqliteCache(str(tmp_path / "cache.db"), 2, 60)) == [1, None, 3]
+
+
+def test_sqlite_cache_replaces_a_table_without_last_used(tmp_path):
+    path = str(tmp_path / "cache.db")
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "CREATE TABLE cache_entries (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+
+    backend = SqliteCache(path, 2, 60)
+    backend.set("a", 1)
+
+    assert backend.get("a") == 1
@@ -0,0 +1,118 @@
+import random
+import time
+
+import pytest
+
+import crowdstrike
+from crowdstrike import RateLimiter, get_crowdstrike_detect_summaries, get_session, incremental_filter
+
+
+@pytest.fixture(autouse=True)
+def fresh_client(monkeypatch):
+    monkeypatch.setattr(crowdstrike, "_session", None)
+    monkeypatch.setattr(crowdstrike, "_token_cache", {"key": None, "access_token": None, "expires_at": 0.0})
+    monkeypatch.setattr(crowdstrike, "_rate_limiter", RateLimiter(0))
+    monkeypatch.setattr(crowdstrike, "BACKOFF_SECONDS", 0)
+
+
+def credentials(base_url):
+    return base_url, "client", "secret"
+
+
+def detect_ids(server, count, seed=1):
+    ids = [det["detection_id"] for det in server.detections[:count]]
+    random.Random(seed).shuffle(ids)
+    return ids
+
+
+def test_summaries_keep_requested_order(make_stub):
+    server, base_url = make_stub(detections=450, latency=0.01)
+    wanted = detect_ids(server, 450)
+
+    summaries = get_crowdstrike_detect_summaries(credentials(base_url), wanted)
+
+    assert [det["detection_id"] for det in summaries] == wanted
+
+
+@pytest.mark.parametrize("fail_status", [429, 500, 503])
+def test_injected_failures_are_retried(make_stub, fail_status):
+    server, base_url = make_stub(detections=600, fail_every=3, fail_status=fail_status)
+    wanted = detect_ids(server, 600)
+
+    summaries = get_crowdstrike_detect_summaries(credentials(base_url), wanted)
+
+    assert [det["detection_id"] for det in summaries] == wanted
+    chunks = len(wanted) // crowdstrike.SUMMARY_CHUNK_SIZE
+    assert server.request_count > chunks
+
+
+def test_requests_reuse_the_pooled_session(make_stub):
+    server, base_url = make_stub(detections=1000, latency=0.005)
+    session = get_session()
+    wanted = detect_ids(server, 1000)
+
+    for _ in range(3):
+        get_crowdstrike_detect_summaries(credentials(base_url), wanted)
+
+    assert get_session() is session
+    assert server.request_count == 30
+    assert len(server.client_ports) <= crowdstrike.FETCH_WORKERS
+
+
+def test_requests_stay_within_the_rate_limit(make_stub, monkeypatch):
+    per_second = 20
+    monkeypatch.setattr(crowdstrike, "_rate_limiter", RateLimiter(per_second))
+    server, base_url = make_stub(detections=1000)
+
+    get_crowdstrike_detect_summaries(credentials(base_url), detect_ids(server, 1000))
+
+    times = sorted(server.request_times)
+    assert len(times) == 10
+    # Evenly spaced slots: n requests need at least (n - 1) intervals.
+    for first, last, count in ((times[0], times[-1], len(times)), (times[2], times[7], 6)):
+        assert last - first >= (count - 1) / per_second * 0.9
+
+
+def test_one_token_per_ttl(make_stub):
+    server, base_url = make_stub(detections=1000, token_ttl=3600)
+    wanted = detect_ids(server, 1000)
+
+    # Ten concurrent chunks, twice: the first caller fetches, the rest wait.
+    get_crowdstrike_detect_summaries(credentials(base_url), wanted)
+    get_crowdstrike_detect_summaries(credentials(base_url), wanted)
+
+    assert server.token_requests == 1
+
+
+def test_token_is_fetched_again_after_its_ttl(make_stub):
+    server, base_url = make_stub(detections=100, token_ttl=crowdstrike.TOKEN_REFRESH_MARGIN + 0.2)
+    wanted = detect_ids(server, 100)
+
+    get_crowdstrike_detect_summaries(credentials(base_url), wanted)
+    time.sleep(0.3)
+    get_crowdstrike_detect_summaries(credentials(base_url), wanted)
+
+    assert server.token_requests == 2
+
+
+def test_token_is_refreshed_once_after_401(make_stub):
+    server, base_url = make_stub(detections=1000, token_ttl=3600)
+    wanted = detect_ids(server, 1000)
+    get_crowdstrike_detect_summaries(credentials(base_url), wanted)
+
+    # Revoked upstream: every in-flight chunk gets a 401 for the old token.
+    server.token = "rotated-token"
+    summaries = get_crowdstrike_detect_summaries(credentials(base_url), wanted)
+
+    assert [det["detection_id"] for det in summaries] == wanted
+    assert server.token_requests == 2
+
+
+def test_incremental_filter_groups_the_user_filter():
+    newer = "created_timestamp:>='2026-01-01T00:00:00Z'"
+
+    assert incremental_filter("status:'new',status:'in_progress'", "2026-01-01T00:00:00Z") == (
+        f"(status:'new',status:'in_progress')+{newer}"
+    )
+    assert incremental_filter(None, "2026-01-01T00:00:00Z") == newer
+    assert incremental_filter("status:'new'", None) == "status:'new'"
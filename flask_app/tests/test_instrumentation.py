@@ -0,0 +1,84 @@
+import threading
+
+import pytest
+from flask import Flask
+
+import instrumentation
+from instrumentation import init_instrumentation
+
+
+class ProcessWideProfile:
+    # Mirrors cProfile on Python 3.12+, where one profiler is active per
+    # process and a second enable() raises.
+    active = []
+
+    def enable(self):
+        if self.active:
+            raise ValueError("Another profiling tool is already active")
+        self.active.append(self)
+
+    def disable(self):
+        self.active.remove(self)
+
+    def dump_stats(self, path):
+        open(path, "w").close()
+
+
+@pytest.fixture
+def profiled_app(tmp_path, monkeypatch):
+    monkeypatch.setattr(instrumentation, "PROFILE_SLOW_REQUEST_MS", 1)
+    monkeypatch.setattr(instrumentation.cProfile, "Profile", ProcessWideProfile)
+    monkeypatch.setattr(ProcessWideProfile, "active", [])
+    barrier = threading.Barrier(2, timeout=5)
+
+    app = Flask(__name__)
+    app.instance_path = str(tmp_path)
+    init_instrumentation(app)
+
+    @app.route("/overlap")
+    def overlap():
+        barrier.wait()
+        return "ok"
+
+    @app.route("/plain")
+    def plain():
+        return "ok"
+
+    @app.route("/fail")
+    def fail():
+        raise RuntimeError("boom")
+
+    return app
+
+
+def test_overlapping_requests_with_profiling(profiled_app, tmp_path):
+    statuses = []
+
+    def get():
+        statuses.append(profiled_app.test_client().get("/overlap").status_code)
+
+    threads = [threading.Thread(target=get) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert statuses == [200, 200]
+    assert len(list((tmp_path / "profiles").iterdir())) == 1
+    assert not ProcessWideProfile.active
+
+
+def test_profiler_is_released_when_a_request_raises(profiled_app):
+    profiled_app.config["PROPAGATE_EXCEPTIONS"] = True
+    with pytest.raises(RuntimeError):
+        profiled_app.test_client().get("/fail")
+
+    assert not ProcessWideProfile.active
+    assert not instrumentation._profile_lock.locked()
+
+
+def test_other_active_profiler_is_tolerated(profiled_app):
+    ProcessWideProfile.active.append(object())
+
+    assert profiled_app.test_client().get("/plain").status_code == 200
+    assert not instrumentation._profile_lock.locked()
@@ -0,0 +1,78 @@
+import pytest
+from sqlalchemy import event
+
+from app import create_app, init_db
+from datagen import generate_dataset
+from models import db
+from rollups import pending_rollup_days, roll_up_days
+
+# Statements per request once the session user and the SLA sweep are warm.
+# Resolver names come from the same query as the tickets (joinedload or
+# contains_eager), so none of these may grow with the page size.
+LIST_QUERIES = 2
+DASHBOARD_QUERIES = 3
+API_TICKETS_QUERIES = 2
+
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    instance = tmp_path_factory.mktemp("instance")
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setenv("SQLALCHEMY_DATABASE_URI", f"sqlite:///{instance / 'app.db'}")
+        patch.setenv("AUTO_INIT_DB", "0")
+        app = create_app()
+        # init_db also writes seed markers under the instance folder.
+        app.instance_path = str(instance)
+        init_db(app)
+        with app.app_context():
+            generate_dataset(1000, 20)
+            # A pending backfill would run in a job thread while we count.
+            roll_up_days(pending_rollup_days())
+            yield app
+            db.session.remove()
+            db.engine.dispose()
+
+
+@pytest.fixture(scope="module")
+def client(app):
+    client = app.test_client()
+    client.post("/login", data={"username": "lucasadmin", "password": "Molurus8@"})
+    return client
+
+
+@pytest.fixture(scope="module")
+def count_queries(app, client):
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+
+    def count(path):
+        # The first request loads the user cache and may run the SLA sweep.
+        client.get(path)
+        statements.clear()
+        response = client.get(path)
+        assert response.status_code == 200
+        return len(statements)
+
+    yield count
+    event.remove(db.engine, "before_cursor_execute", record)
+
+
+@pytest.mark.parametrize("resolver", ["", "resolver 000"])
+@pytest.mark.parametrize("page_size", [25, 200])
+def test_ticket_list_query_count(count_queries, page_size, resolver):
+    path = f"/misconfigurations?page_size={page_size}&resolver={resolver}"
+
+    assert count_queries(path) == LIST_QUERIES
+
+
+def test_dashboard_query_count(count_queries):
+    assert count_queries("/") == DASHBOARD_QUERIES
+
+
+@pytest.mark.parametrize("page_size", [25, 200])
+def test_api_tickets_query_count(count_queries, page_size):
+    assert count_queries(f"/api/tickets?page_size={page_size}") == API_TICKETS_QUERIES
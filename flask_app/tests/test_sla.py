@@ -0,0 +1,98 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+
+import sla
+from app import create_app, init_db
+from models import db, Misconfiguration, Resolver
+from ranking import rebuild_resolver_stats, stats_table, unassigned_table
+from versions import table_versions
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv("SQLALCHEMY_DATABASE_URI", f"sqlite:///{tmp_path / 'app.db'}")
+    monkeypatch.setenv("AUTO_INIT_DB", "0")
+    app = create_app()
+    app.instance_path = str(tmp_path)
+    init_db(app)
+    with app.app_context():
+        db.session.add_all([Resolver(name="Ana", email="ana@example.com"), Resolver(name="Bia", email="bia@example.com")])
+        db.session.commit()
+        db.session.remove()
+        sla.invalidate()
+        yield app
+        db.session.remove()
+        db.engine.dispose()
+
+
+def stored_stats():
+    def rounded(rows):
+        return sorted(tuple(round(v, 3) if isinstance(v, float) else v for v in row) for row in rows)
+
+    return (
+        rounded(db.session.execute(select(stats_table)).all()),
+        rounded(db.session.execute(select(unassigned_table)).all()),
+    )
+
+
+def expired_ticket(status, index):
+    past = datetime.utcnow() - timedelta(days=3)
+    ticket = Misconfiguration(
+        ticket_id=f"SLA-{index}",
+        severity="HIGH",
+        provider="AWS",
+        resource="bucket",
+        description="expired",
+        resolver_id=db.session.scalars(select(Resolver.id).order_by(Resolver.id)).first(),
+        status=status,
+        sla_deadline=past,
+        detected_at=past - timedelta(days=1),
+        crowdstrike_id=f"CS-SLA-{index}",
+    )
+    db.session.add(ticket)
+    db.session.commit()
+    return ticket.id
+
+
+def test_sweep_counts_only_rows_it_changed(app):
+    resolved_id = expired_ticket("Open", 1)
+    reassigned_id = expired_ticket("In Progress", 2)
+    (version,), _ = table_versions("misconfigurations")
+    db.session.remove()
+
+    changed = []
+
+    def change_concurrently(conn, cursor, statement, parameters, context, executemany):
+        # Another request resolves one expired ticket and reassigns another
+        # right before the sweep writes.
+        if changed or not statement.startswith("UPDATE misconfigurations SET status"):
+            return
+        changed.append(True)
+        with Session(db.engine) as other:
+            ticket = other.get(Misconfiguration, resolved_id)
+            ticket.status = "Resolved"
+            ticket.resolved_at = datetime.utcnow()
+            ticket = other.get(Misconfiguration, reassigned_id)
+            ticket.resolver_id = other.scalars(
+                select(Resolver.id).where(Resolver.id != ticket.resolver_id)
+            ).first()
+            other.commit()
+
+    event.listen(db.engine, "before_cursor_execute", change_concurrently)
+    try:
+        updated = sla.ensure_overdue_status()
+    finally:
+        event.remove(db.engine, "before_cursor_execute", change_concurrently)
+
+    assert changed and updated
+    # The concurrent commit bumped the version once; the sweep must too.
+    assert table_versions("misconfigurations")[0][0] >= version + 2
+    assert db.session.get(Misconfiguration, resolved_id).status == "Resolved"
+    assert db.session.get(Misconfiguration, reassigned_id).status == "Overdue"
+    maintained = stored_stats()
+    rebuild_resolver_stats()
+    db.session.commit()
+    assert maintained == stored_stats()
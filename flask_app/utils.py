@@ -2,10 +2,13 @@ import os
 import random
 from datetime import datetime, timedelta
 
-import requests
 from flask import current_app
 
 from models import db, User, Resolver, Misconfiguration
+from archive import archived_crowdstrike_ids, archived_ticket_ids
+from instrumentation import increment
+from ranking import rebuild_resolver_stats, record_inserted_tickets
+from sla import invalidate as invalidate_sla_deadline
 
 
 SLA_HOURS = {
@@ -20,6 +23,10 @@ SEVERITIES = ["CRITICAL", "HIGH", "MEDIUM", "LOW", "INFORMAL"]
 PROVIDERS = ["AWS", "GCP", "Azure"]
 STATUSES = ["Open", "In Progress", "Resolved", "Overdue"]
 
+# 11 bound parameters per row keeps a multi-row INSERT below SQLite's
+# 32766 variable limit.
+IMPORT_CHUNK_SIZE = 500
+
 RESOURCES = [
     "s3://production-logs-backup",
     "vm-instance-db-primary",
@@ -91,19 +98,6 @@ def parse_timestamp(value):
         return datetime.utcnow()
 
 
-def ensure_overdue_status():
-    now = datetime.utcnow()
-    tickets = Misconfiguration.query.all()
-    updated = False
-    for ticket in tickets:
-        if ticket.status != "Resolved" and now > ticket.sla_deadline:
-            if ticket.status != "Overdue":
-                ticket.status = "Overdue"
-                updated = True
-    if updated:
-        db.session.commit()
-
-
 def seed_default_admin():
     default_username = "lucasadmin"
     default_password = "Molurus8@"
@@ -115,124 +109,143 @@ def seed_default_admin():
         db.session.commit()
 
 
-def get_crowdstrike_token(base_url, client_id, client_secret):
-    url = f"{base_url.rstrip('/')}/oauth2/token"
-    response = requests.post(
-        url,
-        data={"client_id": client_id, "client_secret": client_secret},
-        timeout=15,
-    )
-    response.raise_for_status()
-    return response.json().get("access_token")
-
-
-def query_crowdstrike_detect_ids(base_url, token, limit=50, filter_query=None):
-    url = f"{base_url.rstrip('/')}/detects/queries/detects/v1"
-    headers = {"Authorization": f"Bearer {token}"}
-    params = {"limit": limit}
-    if filter_query:
-        params["filter"] = filter_query
-    response = requests.get(url, headers=headers, params=params, timeout=15)
-    response.raise_for_status()
-    body = response.json()
-    return body.get("resources", []) or []
-
-
-def get_crowdstrike_detect_summaries(base_url, token, detect_ids):
-    url = f"{base_url.rstrip('/')}/detects/entities/summaries/GET"
-    headers = {"Authorization": f"Bearer {token}"}
-    summaries = []
-    for i in range(0, len(detect_ids), 100):
-        chunk = detect_ids[i : i + 100]
-        response = requests.get(
-            url,
-            headers=headers,
-            params={"ids": ",".join(chunk)},
-            timeout=20,
-        )
-        response.raise_for_status()
-        body = response.json()
-        summaries.extend(body.get("resources", []) or [])
-    return summaries
-
+def detection_to_row(det):
+    detection_id = det.get("detection_id") or det.get("id")
+    if not detection_id:
+        return None
 
-def import_crowdstrike_detections(detections):
-    imported = 0
-    for det in detections:
-        detection_id = det.get("detection_id") or det.get("id")
-        if not detection_id:
-            continue
+    severity = map_severity(det.get("severity") or det.get("max_severity"))
+    provider = map_provider(det.get("cloud_provider") or det.get("cloud_platform"))
 
-        if Misconfiguration.query.filter_by(crowdstrike_id=detection_id).first():
-            continue
+    detected_at = parse_timestamp(
+        det.get("created_timestamp") or det.get("first_behavior") or det.get("timestamp")
+    )
 
-        severity = map_severity(det.get("severity") or det.get("max_severity"))
-        provider = map_provider(det.get("cloud_provider") or det.get("cloud_platform"))
+    status_raw = str(det.get("status") or det.get("state") or "Open").lower()
+    if "resolved" in status_raw or "closed" in status_raw:
+        status = "Resolved"
+    elif "progress" in status_raw:
+        status = "In Progress"
+    else:
+        status = "Open"
+
+    behaviors = det.get("behaviors") or []
+    description = det.get("description") or (behaviors[0].get("description") if behaviors else None)
+    description = description or f"CrowdStrike detection {detection_id}"
+
+    device = det.get("device") or {}
+    resource = (
+        device.get("hostname")
+        or det.get("device_hostname")
+        or det.get("device_id")
+        or det.get("hostname")
+        or "CrowdStrike"
+    )
 
-        detected_at = parse_timestamp(
-            det.get("created_timestamp") or det.get("first_behavior") or det.get("timestamp")
+    return {
+        "ticket_id": f"CS-{detection_id}"[:40],
+        "severity": severity,
+        "provider": provider,
+        "resource": str(resource),
+        "description": str(description),
+        "resolver_id": None,
+        "status": status,
+        "sla_deadline": calculate_sla_deadline(severity, detected_at),
+        "detected_at": detected_at,
+        "crowdstrike_id": str(detection_id),
+        "resolved_at": datetime.utcnow() if status == "Resolved" else None,
+    }
+
+
+def insert_ignoring_conflicts(model):
+    if db.engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model).on_conflict_do_nothing()
+
+
+def _import_detection_chunk(rows, counts):
+    existing = dict(
+        db.session.query(Misconfiguration.crowdstrike_id, Misconfiguration.status).filter(
+            Misconfiguration.crowdstrike_id.in_([row["crowdstrike_id"] for row in rows])
         )
-
-        status_raw = str(det.get("status") or det.get("state") or "Open").lower()
-        if "resolved" in status_raw or "closed" in status_raw:
-            status = "Resolved"
-        elif "progress" in status_raw:
-            status = "In Progress"
+    )
+    # Archived detections were resolved long ago; they must not come back as new.
+    unknown = [row["crowdstrike_id"] for row in rows if row["crowdstrike_id"] not in existing]
+    if unknown:
+        existing.update(dict.fromkeys(archived_crowdstrike_ids(unknown), "Resolved"))
+
+    resolved_upstream = []
+    new_rows = []
+    for row in rows:
+        status = existing.get(row["crowdstrike_id"])
+        if status is None:
+            new_rows.append(row)
+        elif row["status"] == "Resolved" and status != "Resolved":
+            resolved_upstream.append(row["crowdstrike_id"])
         else:
-            status = "Open"
-
-        behaviors = det.get("behaviors") or []
-        description = det.get("description") or (behaviors[0].get("description") if behaviors else None)
-        description = description or f"CrowdStrike detection {detection_id}"
-
-        device = det.get("device") or {}
-        resource = (
-            device.get("hostname")
-            or det.get("device_hostname")
-            or det.get("device_id")
-            or det.get("hostname")
-            or "CrowdStrike"
-        )
-
-        ticket_id = f"CS-{detection_id}"
-        if len(ticket_id) > 40:
-            ticket_id = ticket_id[:40]
-        if Misconfiguration.query.filter_by(ticket_id=ticket_id).first():
-            ticket_id = f"{ticket_id[:35]}-{random.randint(1000, 9999)}"
+            counts["skipped"] += 1
+
+    # Closing goes through the ORM so resolver statistics follow the change.
+    if resolved_upstream:
+        for ticket in Misconfiguration.query.filter(
+            Misconfiguration.crowdstrike_id.in_(resolved_upstream)
+        ):
+            ticket.status = "Resolved"
+        db.session.flush()
+        counts["updated"] += len(resolved_upstream)
+
+    if not new_rows:
+        return
 
-        ticket = Misconfiguration(
-            ticket_id=ticket_id,
-            severity=severity,
-            provider=provider,
-            resource=str(resource),
-            description=str(description),
-            resolver_id=None,
-            status=status,
-            sla_deadline=calculate_sla_deadline(severity, detected_at),
-            detected_at=detected_at,
-            crowdstrike_id=str(detection_id),
+    ticket_ids = [row["ticket_id"] for row in new_rows]
+    taken = set(
+        ticket_id
+        for (ticket_id,) in db.session.query(Misconfiguration.ticket_id).filter(
+            Misconfiguration.ticket_id.in_(ticket_ids)
         )
-        db.session.add(ticket)
-        imported += 1
+    )
+    taken |= archived_ticket_ids(ticket_ids)
+    for row in new_rows:
+        if row["ticket_id"] in taken:
+            row["ticket_id"] = f"{row['ticket_id'][:35]}-{random.randint(1000, 9999)}"
+        taken.add(row["ticket_id"])
+
+    result = db.session.execute(insert_ignoring_conflicts(Misconfiguration).values(new_rows))
+    if result.rowcount == len(new_rows):
+        record_inserted_tickets(new_rows)
+    else:
+        # A concurrent insert won some rows; recount the buckets involved.
+        rebuild_resolver_stats({row["resolver_id"] for row in new_rows})
+    counts["inserted"] += result.rowcount
+    counts["skipped"] += len(new_rows) - result.rowcount
+
+    open_deadlines = [row["sla_deadline"] for row in new_rows if row["status"] != "Resolved"]
+    if open_deadlines:
+        invalidate_sla_deadline(min(open_deadlines))
 
-    if imported:
-        db.session.commit()
-    return imported
 
+def import_crowdstrike_detections(detections):
+    counts = {"inserted": 0, "skipped": 0, "updated": 0}
+
+    rows = {}
+    for det in detections:
+        row = detection_to_row(det)
+        if row is None or row["crowdstrike_id"] in rows:
+            counts["skipped"] += 1
+            continue
+        rows[row["crowdstrike_id"]] = row
 
-def fetch_and_import_crowdstrike(limit=50, filter_query=None):
-    base_url = os.getenv("CROWDSTRIKE_BASE_URL", "https://api.crowdstrike.com")
-    client_id = os.getenv("CROWDSTRIKE_CLIENT_ID")
-    client_secret = os.getenv("CROWDSTRIKE_CLIENT_SECRET")
-    if not client_id or not client_secret:
-        raise RuntimeError("Credenciais do CrowdStrike não configuradas.")
+    pending = list(rows.values())
+    for i in range(0, len(pending), IMPORT_CHUNK_SIZE):
+        _import_detection_chunk(pending[i : i + IMPORT_CHUNK_SIZE], counts)
 
-    token = get_crowdstrike_token(base_url, client_id, client_secret)
-    detect_ids = query_crowdstrike_detect_ids(base_url, token, limit=limit, filter_query=filter_query)
-    if not detect_ids:
-        return 0
-    summaries = get_crowdstrike_detect_summaries(base_url, token, detect_ids)
-    return import_crowdstrike_detections(summaries)
+    if counts["inserted"] or counts["updated"]:
+        db.session.commit()
+    for result, total in counts.items():
+        increment("crowdstrike_detections_total", total, result=result)
+    return counts
 
 
 def seed_mock_data_if_empty():
@@ -259,7 +272,9 @@ def seed_mock_data_if_empty():
     resolvers = Resolver.query.all()
     now = datetime.utcnow()
 
-    for _ in range(35):
+    ticket_numbers = random.sample(range(10000), 35)
+    crowdstrike_numbers = random.sample(range(1_000_000), 35)
+    for ticket_number, crowdstrike_number in zip(ticket_numbers, crowdstrike_numbers):
         severity = random.choice(SEVERITIES)
         provider = random.choice(PROVIDERS)
         detected_at = now - timedelta(days=random.randint(0, 30), hours=random.randint(0, 23))
@@ -270,7 +285,7 @@ def seed_mock_data_if_empty():
 
         resolver = random.choice(resolvers + [None])
         ticket = Misconfiguration(
-            ticket_id=f"MC-{random.randint(0, 9999):04d}",
+            ticket_id=f"MC-{ticket_number:04d}",
             severity=severity,
             provider=provider,
             resource=random.choice(RESOURCES),
@@ -279,7 +294,7 @@ def seed_mock_data_if_empty():
             status=status,
             sla_deadline=sla_deadline,
             detected_at=detected_at,
-            crowdstrike_id=f"CS-{now.year}-{random.randint(0, 999999)}",
+            crowdstrike_id=f"CS-{now.year}-{crowdstrike_number}",
         )
         db.session.add(ticket)
 
@@ -0,0 +1,75 @@
+from datetime import datetime
+
+from sqlalchemy import event, insert, inspect, select, update
+from sqlalchemy.orm import Session
+
+from models import db, TableVersion
+
+
+# Per-table change counters. Readers derive ETags and cache keys from them,
+# so only tables whose content is served from those paths are tracked.
+TRACKED_TABLES = ("misconfigurations", "archived_misconfigurations", "resolvers", "daily_rollups")
+
+versions_table = TableVersion.__table__
+
+
+def bump_versions(connection, names):
+    now = datetime.utcnow()
+    for name in sorted(set(names)):
+        result = connection.execute(
+            update(versions_table)
+            .where(versions_table.c.name == name)
+            .values(version=versions_table.c.version + 1, updated_at=now)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(versions_table).values(name=name, version=1, updated_at=now))
+
+
+def table_versions(*names):
+    rows = db.session.execute(
+        select(versions_table.c.name, versions_table.c.version, versions_table.c.updated_at).where(
+            versions_table.c.name.in_(names)
+        )
+    ).all()
+    found = {name: (version, updated_at) for name, version, updated_at in rows}
+    versions = tuple(found.get(name, (0, None))[0] for name in names)
+    stamps = [updated_at for _, updated_at in found.values() if updated_at]
+    return versions, max(stamps) if stamps else None
+
+
+def _tracked(name):
+    return name in TRACKED_TABLES
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_flushed_tables(session, flush_context):
+    names = set()
+    for obj in session.new | session.deleted:
+        names.add(inspect(obj).mapper.local_table.name)
+    for obj in session.dirty:
+        if session.is_modified(obj, include_collections=False):
+            names.add(inspect(obj).mapper.local_table.name)
+    names = [name for name in names if _tracked(name)]
+    if names:
+        bump_versions(session.connection(), names)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bump_bulk_statement_tables(orm_execute_state):
+    if not (orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete):
+        return None
+    table = getattr(orm_execute_state.statement, "table", None)
+    if table is None or not _tracked(table.name):
+        return None
+
+    result = orm_execute_state.invoke_statement()
+    if hasattr(result, "rowcount"):
+        changed = result.rowcount != 0
+    else:
+        # ORM statements with RETURNING give back rows, not a rowcount.
+        frozen = result.freeze()
+        changed = bool(frozen.data)
+        result = frozen()
+    if changed:
+        bump_versions(orm_execute_state.session.connection(), [table.name])
+    return result